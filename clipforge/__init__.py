@@ -0,0 +1 @@
+"""Headless entry points for ClipForge (no Tk, VLC or webview required)."""
@@ -0,0 +1,301 @@
+# cli.py
+
+import argparse
+import csv
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+
+from core.event_bus import event_bus
+
+TRIM_EVENTS = (
+    "trim_task_started",
+    "trim_task_progress",
+    "trim_task_complete",
+    "trim_task_failed",
+    "trim_task_cancelled",
+    "clip_cache_stats",
+    "trim_queue_complete",
+)
+DOWNLOAD_EVENTS = (
+    "download_queued",
+    "download_started",
+    "download_format_chosen",
+    "download_progress",
+    "download_complete",
+    "download_failed",
+    "download_cancelled",
+    "download_entry_skipped",
+    "download_feed_failed",
+    "download_feed_complete",
+)
+PIPELINE_EVENTS = (
+    "pipeline_job_trimming",
+    "pipeline_job_complete",
+    "pipeline_job_failed",
+    "pipeline_complete",
+)
+HIGHLIGHT_EVENTS = (
+    "highlight_scan_progress",
+    "highlight_scan_complete",
+)
+FAILURE_EVENTS = ("trim_task_failed", "download_failed", "download_feed_failed")
+
+# Modules that must not be imported before the main window is shown.
+HEAVY_MODULES = ("yt_dlp", "vlc", "webview", "numpy")
+DEFAULT_STARTUP_BUDGET = 1.0
+
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import gui.gui_shell
+seconds = time.perf_counter() - t0
+print(json.dumps({"seconds": seconds, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+class JsonLinesReporter:
+    """Prints every subscribed event as one JSON object per line and counts failures."""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def attach(self, event_names):
+        for name in event_names:
+            event_bus.subscribe(name, lambda data, name=name: self.emit(name, data))
+
+    def emit(self, event_name, data=None):
+        line = json.dumps({"event": event_name, "data": data}, default=str)
+        with self._lock:
+            if event_name in FAILURE_EVENTS:
+                self.failures += 1
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+def load_manifest(path):
+    """
+    Reads trim tasks from a CSV file with video,start,end columns or from a JSON
+    file holding a list of {"video", "start", "end"} objects (or one object per line).
+    An optional audio column/key names a separately downloaded audio stream for the video.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            text = f.read()
+            try:
+                rows = json.loads(text)
+            except json.JSONDecodeError:
+                rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    tasks = []
+    for n, row in enumerate(rows, start=1):
+        try:
+            task = {"video": row["video"], "start": str(row["start"]), "end": str(row["end"])}
+            if row.get("audio"):
+                task["audio"] = row["audio"]
+            tasks.append(task)
+        except (KeyError, TypeError):
+            raise ValueError(f"{path}: entry {n} needs video, start and end")
+    return tasks
+
+def cmd_trim(args, reporter):
+    from core.clip_cache import clip_cache
+    from core.job_store import JobStore
+    from core.trimmer import process_trim_tasks
+
+    if not args.manifest and not args.store:
+        raise ValueError("trim needs a manifest, a --store to resume, or both")
+    tasks = load_manifest(args.manifest) if args.manifest else []
+    if args.store:
+        # A persistent queue: rerunning the same command resumes unfinished work,
+        # and tasks added to the manifest since are queued behind it.
+        queue = JobStore(args.store)
+        queue.add_missing(tasks)
+    else:
+        queue = tasks
+    cache = None if args.no_cache else clip_cache
+    process_trim_tasks(queue, max_workers=args.jobs, mode=args.mode, cache=cache).join()
+
+def parse_range(text):
+    """'START-END' with times as HH:MM:SS(.mmm), MM:SS or seconds -> (start, end)."""
+    start, sep, end = text.partition("-")
+    if not sep or not start or not end:
+        raise argparse.ArgumentTypeError(f"expected START-END, got {text!r}")
+    return start.strip(), end.strip()
+
+def cmd_download(args, reporter):
+    from core.downloader import download_manager, iter_playlist_entries
+    from core.job_store import JobStore
+
+    # stdout is reserved for JSON lines
+    download_manager.ydl_opts.update(quiet=True, noprogress=True, no_warnings=True)
+    download_manager.set_max_concurrent(args.parallel)
+    download_manager.set_concurrent_fragments(args.fragments)
+    download_manager.set_format_policy(args.format_policy)
+    download_manager.set_separate_streams(args.separate_streams)
+    if args.range or args.store:
+        # Range-only: fetch just the trimmed parts of each URL and cut them.
+        store = JobStore(args.store) if args.store else None
+        jobs = [
+            download_manager.submit_ranges(url, args.range, store, args.resolution, margin=args.margin, trim_mode=args.mode)
+            for url in args.urls
+        ]
+        download_manager.wait()
+        for job in jobs:
+            if job.trim_thread is not None:
+                job.trim_thread.join()
+    else:
+        for url in args.urls:
+            download_manager.submit_many(iter_playlist_entries(url), args.resolution, lookahead=args.lookahead)
+        download_manager.wait()
+    # Published here rather than subscribed, so it is always the last line.
+    reporter.emit("download_session_stats", download_manager.stats.summary())
+
+def cmd_pipeline(args, reporter):
+    from core.clip_cache import clip_cache
+    from core.job_store import JobStore
+    from core.pipeline import Pipeline
+
+    ranges = {}
+    for task in load_manifest(args.manifest):
+        ranges.setdefault(task["video"], []).append((task["start"], task["end"]))
+    pipeline = Pipeline(
+        download_slots=args.download_slots,
+        trim_slots=args.trim_slots,
+        mode=args.mode,
+        resolution=args.resolution,
+        ranges_only=args.ranges_only,
+        store=JobStore(args.store) if args.store else None,
+        cache=None if args.no_cache else clip_cache,
+    )
+    # stdout is reserved for JSON lines
+    pipeline.manager.ydl_opts.update(quiet=True, noprogress=True, no_warnings=True)
+    pipeline.manager.set_format_policy(args.format_policy)
+    pipeline.manager.set_separate_streams(args.separate_streams)
+    for url, url_ranges in ranges.items():
+        pipeline.submit(url, url_ranges)
+    pipeline.wait()
+    pipeline.shutdown()
+    reporter.emit("download_session_stats", pipeline.manager.stats.summary())
+
+def cmd_highlights(args, reporter):
+    from core.highlights import propose_highlights
+    from core.job_store import JobStore
+
+    tasks = propose_highlights(args.video, args.audio, top=args.top, clip_seconds=args.clip_seconds)
+    if args.store:
+        JobStore(args.store).add_many(tasks)
+    reporter.emit("highlight_tasks_proposed", tasks)
+
+def cmd_bench_startup(args, reporter):
+    """
+    Times the GUI's import path in fresh interpreters and fails if the median exceeds
+    the budget or if a heavy backend is imported before the window can appear.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    heavy = set()
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE],
+            cwd=root, check=True, stdout=subprocess.PIPE, text=True
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy.update(probe["heavy"])
+    median = statistics.median(samples)
+    ok = median <= args.budget and not heavy
+    reporter.emit("startup_benchmark", {
+        "median_seconds": median,
+        "max_seconds": max(samples),
+        "budget_seconds": args.budget,
+        "eager_heavy_modules": sorted(heavy),
+        "ok": ok,
+    })
+    if not ok:
+        reporter.failures += 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="clipforge", description="Headless ClipForge batch runner.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    trim = sub.add_parser("trim", help="Cut clips listed in a CSV/JSON manifest.")
+    trim.add_argument("manifest", nargs="?", help="CSV (video,start,end[,audio]) or JSON task list")
+    trim.add_argument("--jobs", "-j", type=int, default=None, help="parallel ffmpeg processes (default: CPU count)")
+    trim.add_argument("--mode", choices=("copy", "smart", "reencode"), default="copy")
+    trim.add_argument("--no-cache", action="store_true", help="always re-cut, ignoring the clip cache")
+    trim.add_argument("--store", help="SQLite queue file; resumes unfinished tasks when rerun")
+    trim.set_defaults(func=cmd_trim, events=TRIM_EVENTS)
+
+    download = sub.add_parser("download", help="Download one or more videos.")
+    download.add_argument("urls", nargs="+")
+    download.add_argument("--resolution", default="1080p", help="e.g. 1080p, 720p or best")
+    download.add_argument("--parallel", "-p", type=int, default=3, help="concurrent downloads")
+    download.add_argument("--lookahead", type=int, default=4, help="playlist entries queued ahead of running downloads")
+    download.add_argument("--fragments", default="auto",
+                          help="fragments fetched in parallel per DASH/HLS download, or 'auto' (default)")
+    download.add_argument("--format-policy", choices=("default", "clip"), default="default",
+                          help="'clip' prefers H.264/AAC in MP4, which trims without re-encoding")
+    download.add_argument("--separate-streams", action="store_true",
+                          help="keep video and audio as separate files instead of merging them")
+    download.add_argument("--range", action="append", type=parse_range, metavar="START-END",
+                          help="download only this part (plus --margin) and trim it; repeatable")
+    download.add_argument("--store", help="SQLite trim queue; its pending tasks whose video is the URL are fetched and trimmed")
+    download.add_argument("--margin", type=float, default=5.0, help="seconds fetched around each range (default: %(default)s)")
+    download.add_argument("--mode", choices=("copy", "smart", "reencode"), default="copy", help="trim mode for ranges")
+    download.set_defaults(func=cmd_download, events=DOWNLOAD_EVENTS + TRIM_EVENTS)
+
+    pipeline = sub.add_parser("pipeline", help="Download URLs and cut their clips, overlapping the two stages.")
+    pipeline.add_argument("manifest", help="CSV (video,start,end) or JSON task list whose videos are URLs")
+    pipeline.add_argument("--download-slots", type=int, default=3, help="concurrent downloads")
+    pipeline.add_argument("--trim-slots", type=int, default=None, help="concurrent ffmpeg trims (default: CPU count)")
+    pipeline.add_argument("--mode", choices=("copy", "smart", "reencode"), default="copy")
+    pipeline.add_argument("--resolution", default="1080p", help="e.g. 1080p, 720p or best")
+    pipeline.add_argument("--ranges-only", action="store_true", help="fetch only the parts around each range")
+    pipeline.add_argument("--format-policy", choices=("default", "clip"), default="clip",
+                          help="'clip' (default) prefers H.264/AAC in MP4, which trims without re-encoding")
+    pipeline.add_argument("--separate-streams", action="store_true",
+                          help="skip the merge; clips are cut from the video and audio files directly")
+    pipeline.add_argument("--no-cache", action="store_true", help="always re-cut, ignoring the clip cache")
+    pipeline.add_argument("--store", help="SQLite trim queue file to record the tasks in")
+    pipeline.set_defaults(func=cmd_pipeline, events=DOWNLOAD_EVENTS + TRIM_EVENTS + PIPELINE_EVENTS)
+
+    highlights = sub.add_parser("highlights", help="Find highlight candidates in a video and propose trim tasks.")
+    highlights.add_argument("video")
+    highlights.add_argument("--audio", help="separately downloaded audio stream of the video")
+    highlights.add_argument("--top", "-k", type=int, default=5, help="number of clips to propose (default: %(default)s)")
+    highlights.add_argument("--clip-seconds", type=float, default=30.0, help="length of each clip (default: %(default)s)")
+    highlights.add_argument("--store", help="SQLite trim queue to add the proposed tasks to, for 'trim --store'")
+    highlights.set_defaults(func=cmd_highlights, events=HIGHLIGHT_EVENTS)
+
+    bench = sub.add_parser("bench-startup", help="Check GUI cold-start import time against a budget.")
+    bench.add_argument("--budget", type=float, default=DEFAULT_STARTUP_BUDGET, help="seconds (default: %(default)s)")
+    bench.add_argument("--runs", type=int, default=5)
+    bench.set_defaults(func=cmd_bench_startup, events=())
+    return parser
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = JsonLinesReporter()
+    reporter.attach(args.events)
+    # SIGTERM (e.g. from a job scheduler) stops the run like Ctrl+C does.
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        args.func(args, reporter)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        reporter.emit("error", str(e))
+        return 2
+    except KeyboardInterrupt:
+        from core.engine import subprocess_engine
+        # Kill the ffmpeg process groups; the jobs remove their partial outputs.
+        subprocess_engine.shutdown()
+        reporter.emit("interrupted", None)
+        return 130
+    return 1 if reporter.failures else 0
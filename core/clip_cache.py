@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+import stat
+import threading
+from core.event_bus import event_bus
+from core.paths import cache_dir, file_signature, partial_hash
+
+DEFAULT_MAX_BYTES = 20 * 1024**3
+# Subdirectory of empty marker files whose mtimes record when each entry was last used.
+_RECENCY_DIR = ".used"
+# Bump when the way clips are cut changes, so stale cache entries stop matching.
+_CACHE_VERSION = 1
+
+def link_or_copy(src, dst):
+    """Hard-links src to dst when both live on the same filesystem, copies otherwise."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class ClipCache:
+    """
+    Content-addressed store of finished clips. Entries are keyed on the source's
+    content fingerprint, the cut range and the cut settings, and are hard-linked
+    (or copied) into place on a hit. The least recently used entries are evicted
+    once the cache grows past max_bytes. Entries share their inode with users' clips,
+    so recency is kept on a separate marker file per entry, never on the entry itself.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self._directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._source_hashes = {}
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = cache_dir("clips")
+        return self._directory
+
+    def _source_hash(self, video_file):
+        signature = file_signature(video_file)
+        with self._lock:
+            cached = self._source_hashes.get(signature)
+        if cached is None:
+            cached = partial_hash(video_file)
+            with self._lock:
+                self._source_hashes[signature] = cached
+        return cached
+
+    def key(self, video_file, start_sec, end_sec, settings):
+        """Cache key for cutting start_sec..end_sec out of video_file with the given settings tuple."""
+        ext = os.path.splitext(video_file)[1].lower()
+        parts = [_CACHE_VERSION, self._source_hash(video_file), f"{start_sec:.3f}", f"{end_sec:.3f}", ext, *settings]
+        return hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest() + ext
+
+    def _marker(self, key):
+        return os.path.join(self.directory, _RECENCY_DIR, key)
+
+    def _touch(self, key):
+        """Records that the entry was used now (its LRU position)."""
+        marker = self._marker(key)
+        try:
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, "a"):
+                pass
+            os.utime(marker)
+        except OSError:
+            pass
+
+    def fetch(self, key, output_file):
+        """Places the cached clip at output_file and returns True, or returns False on a miss."""
+        entry = os.path.join(self.directory, key)
+        if not os.path.isfile(entry):
+            with self._lock:
+                self.misses += 1
+            return False
+        tmp = f"{output_file}.cachetmp"
+        try:
+            # Renaming over a hard link to the same file is a no-op that would leave tmp behind.
+            if not (os.path.exists(output_file) and os.path.samefile(entry, output_file)):
+                link_or_copy(entry, tmp)
+                os.replace(tmp, output_file)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        self._touch(key)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, output_file):
+        """Adds a freshly cut clip to the cache, then evicts down to max_bytes."""
+        entry = os.path.join(self.directory, key)
+        tmp = f"{entry}.tmp"
+        try:
+            link_or_copy(output_file, tmp)
+            os.replace(tmp, entry)
+        except OSError:
+            return
+        self._touch(key)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                try:
+                    used = os.stat(self._marker(name)).st_mtime
+                except OSError:
+                    used = st.st_mtime  # No marker yet (e.g. an entry from an older version)
+                entries.append((used, st.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    continue
+                try:
+                    os.remove(self._marker(name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def publish_stats(self):
+        event_bus.publish("clip_cache_stats", self.stats())
+
+# Global clip cache instance
+clip_cache = ClipCache()
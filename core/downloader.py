@@ -1,58 +1,894 @@
+import copy
+import itertools
 import os
+import queue
 import threading
-import yt_dlp
 import re
-from core.event_bus import event_bus
+import subprocess
+import time
+from core.engine import JobCancelled, subprocess_engine
+from core.event_bus import event_bus, Throttle
+from core.ffmpeg import run_ffmpeg
+from core.job_store import JobStore
+from core.library import info_key, media_library
+from core.metadata_cache import metadata_cache
+from core.trimmer import process_trim_tasks, seconds_to_time, time_to_seconds
+
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = 3
+# Playlist entries queued ahead of the running downloads.
+DEFAULT_LOOKAHEAD = 4
+_QUIET_OPTS = {"quiet": True, "no_warnings": True}
+# Seconds fetched either side of each trim range in range-only downloads, so the
+# trimmer still finds a keyframe before the cut and nothing is lost at its end.
+DEFAULT_RANGE_MARGIN = 5.0
+# Minimum seconds between download_progress events of one job.
+PROGRESS_INTERVAL = 0.5
+# Fragments of one DASH/HLS download fetched in parallel ("auto" tunes it per site).
+DEFAULT_CONCURRENT_FRAGMENTS = "auto"
+MAX_CONCURRENT_FRAGMENTS = 16
+# "default" takes yt-dlp's best formats; "clip" prefers what core.trimmer cuts well (see clip_format).
+FORMAT_POLICIES = ("default", "clip")
+
+# How well core.trimmer handles a codec: H.264/HEVC stream-copy cleanly and can be
+# smart-cut; VP9 and AV1 tend to come with sparser keyframes and slower re-encodes.
+_CLIP_VIDEO_CODECS = (("avc1", 1.0), ("h264", 1.0), ("hev1", 0.8), ("hvc1", 0.8), ("h265", 0.8),
+                      ("vp09", 0.4), ("vp9", 0.4), ("av01", 0.2))
+_CLIP_AUDIO_CODECS = (("mp4a", 1.0), ("aac", 1.0), ("opus", 0.5), ("vorbis", 0.3))
 
 def sanitize_filename(title):
     """Removes invalid characters from a filename."""
     return re.sub(r'[<>:"/\\|?*]', '', title).strip()
 
-def get_video_title(url):
-    """Fetches the YouTube video title using yt-dlp."""
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'skip_download': True,
-        'force_generic_extractor': False,
-        'extract_flat': True,  # Only extract metadata
-    }
+def extract_info(url, cache=metadata_cache, refresh=False):
+    """
+    Extracts the info dict of url once, without resolving formats or downloading.
+    Single-video results are cached by video id (see core.metadata_cache), so repeated
+    calls within the cache's TTL skip extraction entirely. The returned dict can be
+    passed straight to YoutubeDL.process_ie_result to download without re-extracting.
+    """
+    if cache is not None and not refresh:
+        info = cache.get(url)
+        if info is not None:
+            return info
+    import yt_dlp  # Heavy; loaded on first use
+    with yt_dlp.YoutubeDL(_QUIET_OPTS) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+    if info.get("_type", "video") != "video":
+        return info  # Playlists hold lazy entries; they are not cached
+    info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=False)
+    if cache is not None:
+        cache.put(url, info)
+    return info
 
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return sanitize_filename(info.get("title", "unknown_video"))
-    except Exception as e:
-        print(f"Error fetching title: {e}")
-        return "unknown_video"
-
-def download_video(url, resolution, auto_load):
-    # Fetch the video title before downloading
-    video_title = get_video_title(url)
-    output_path = os.path.join(os.getcwd(), "videos/downloads/",f"{video_title}.%(ext)s")
-
-    # Build format string based on resolution selection.
+def iter_playlist_entries(url, cache=metadata_cache):
+    """
+    Lazily yields {"url", "id", "ie_key", "title"} for every video behind url.
+    Playlists and channels are listed with flat extraction and their pages are fetched
+    only as the generator is consumed, so the first entry is available long before the
+    whole list has been read. A single-video URL yields itself (its info dict is cached,
+    so the download does not extract it again). Nested playlists such as channel tabs are expanded.
+    """
+    import yt_dlp
+    opts = dict(_QUIET_OPTS, extract_flat="in_playlist")
+    # The YoutubeDL must stay open while the lazy entries are paged in.
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        if info.get("_type", "video") == "video":
+            if cache is not None:
+                cache.put(url, yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=False))
+            yield {"url": url, "id": info.get("id"), "ie_key": info.get("extractor_key"), "title": info.get("title")}
+            return
+        if info.get("_type") == "url":
+            yield from iter_playlist_entries(info["url"], cache)
+            return
+        for entry in info.get("entries") or ():
+            if not entry:
+                continue
+            if entry.get("_type", "video") == "video" and entry.get("formats"):
+                # Already fully extracted inline (e.g. embeds on a generic page).
+                yield {
+                    "url": entry.get("webpage_url") or f"{url}#{entry.get('id')}",
+                    "id": entry.get("id"),
+                    "ie_key": entry.get("extractor_key"),
+                    "title": entry.get("title"),
+                    "info": yt_dlp.YoutubeDL.sanitize_info(entry, remove_private_keys=False),
+                }
+                continue
+            entry_url = entry.get("url") or entry.get("webpage_url")
+            if not entry_url:
+                continue
+            if entry.get("_type") == "playlist" or (entry.get("ie_key") or "").endswith("Tab"):
+                yield from iter_playlist_entries(entry_url, cache)
+                continue
+            yield {"url": entry_url, "id": entry.get("id"), "ie_key": entry.get("ie_key"), "title": entry.get("title")}
+
+def already_downloaded(entry, resolution="best", library=media_library):
+    """True if the media library holds the file a download of this playlist entry at resolution would produce."""
+    key = info_key(entry)
+    return key is not None and library.find(key, max_height(resolution)) is not None
+
+def output_stem(info):
+    """File name (without extension) of a download: its title plus the video id, so equal titles don't collide."""
+    title = sanitize_filename(info.get("title") or "unknown_video")
+    video_id = sanitize_filename(str(info.get("id") or ""))
+    return f"{title} [{video_id}]" if video_id else title
+
+def downloaded_path(ydl, info):
+    """Final path of a processed download (after any merge), falling back to the output template."""
+    for download in info.get("requested_downloads") or ():
+        if download.get("filepath"):
+            return download["filepath"]
+    return ydl.prepare_filename(info)
+
+def max_height(resolution):
+    """Height limit of a resolution choice such as '720p'; None for 'best'."""
     if resolution == "best":
-        fmt = "bestvideo+bestaudio/best"
-    else:
-        try:
-            height = int(resolution[:-1])
-        except ValueError:
-            height = 720
-        fmt = f"bestvideo[height<={height}]+bestaudio/best[height<={height}]"
-
-    ydl_opts = {
-        "format": fmt,
-        "outtmpl": output_path,
+        return None
+    try:
+        return int(resolution[:-1])
+    except ValueError:
+        return 720
+
+def build_format(resolution):
+    """Builds the yt-dlp format string for a resolution choice such as '720p' or 'best'."""
+    height = max_height(resolution)
+    if height is None:
+        return "bestvideo+bestaudio/best"
+    return f"bestvideo[height<={height}]+bestaudio/best[height<={height}]"
+
+def range_task(url, start, end):
+    """A trim task for url; start and end may be seconds or "HH:MM:SS" strings."""
+    return {
+        "video": url,
+        "start": start if isinstance(start, str) else seconds_to_time(start),
+        "end": end if isinstance(end, str) else seconds_to_time(end),
+    }
+
+def pending_trim_ranges(store, url, job_ids=None):
+    """
+    [{"job_id", "start", "end"}] (seconds) for the unfinished trim jobs of store whose
+    video is url, optionally limited to job_ids.
+    """
+    ranges = []
+    for job in store.unfinished():
+        if job["video"] != url or (job_ids is not None and job["id"] not in job_ids):
+            continue
+        start_sec = time_to_seconds(job["start"])
+        end_sec = time_to_seconds(job["end"])
+        if start_sec is None or end_sec is None or end_sec <= start_sec:
+            continue
+        ranges.append({"job_id": job["id"], "start": start_sec, "end": end_sec})
+    return ranges
+
+def merge_ranges(ranges, margin=DEFAULT_RANGE_MARGIN):
+    """
+    Turns (start_sec, end_sec) ranges into the pieces to fetch: each range is widened
+    by margin and overlapping ones share a piece. Returns [(piece_start, piece_end, [indexes])].
+    """
+    pieces = []
+    for index in sorted(range(len(ranges)), key=lambda i: ranges[i][0]):
+        start_sec, end_sec = ranges[index]
+        start_sec, end_sec = max(start_sec - margin, 0.0), end_sec + margin
+        if pieces and start_sec <= pieces[-1][1]:
+            pieces[-1][1] = max(pieces[-1][1], end_sec)
+            pieces[-1][2].append(index)
+        else:
+            pieces.append([start_sec, end_sec, [index]])
+    return [tuple(piece) for piece in pieces]
+
+def _codec_score(codec, table):
+    codec = (codec or "").lower()
+    for prefix, score in table:
+        if codec.startswith(prefix):
+            return score
+    return 0.3
+
+def _has(codec):
+    return codec not in (None, "none")
+
+def _describe(fmt):
+    parts = [f"{fmt['height']}p" if fmt.get("height") else None,
+             (fmt.get("vcodec") or "").split(".")[0] if _has(fmt.get("vcodec")) else None,
+             (fmt.get("acodec") or "").split(".")[0] if _has(fmt.get("acodec")) else None,
+             fmt.get("ext")]
+    return f"{fmt['format_id']} ({' '.join(part for part in parts if part)})"
+
+def clip_format(info, resolution):
+    """
+    Picks formats for clipping: H.264/AAC in MP4 first, as core.trimmer stream-copies
+    and smart-cuts them cleanly, weighed against resolution (up to the requested one)
+    and bitrate, the cost in file size. Keyframe intervals are not part of yt-dlp's
+    metadata, so the codec stands in for them. Returns (format_spec, reason), or None
+    when the info dict does not describe its formats' codecs.
+    """
+    cap = max_height(resolution)
+    formats = [fmt for fmt in info.get("formats") or () if fmt.get("format_id")]
+    videos = [fmt for fmt in formats
+              if _has(fmt.get("vcodec")) and (cap is None or (fmt.get("height") or 0) <= cap)]
+    audios = [fmt for fmt in formats if fmt.get("vcodec") == "none" and _has(fmt.get("acodec"))]
+    if not videos:
+        return None
+    target = max(fmt.get("height") or 0 for fmt in videos) or 1
+    max_rate = max(fmt.get("tbr") or 0 for fmt in videos) or 1
+    max_abr = max((fmt.get("abr") or fmt.get("tbr") or 0 for fmt in audios), default=0) or 1
+
+    def video_score(fmt):
+        return (4.0 * (fmt.get("height") or 0) / target
+                + _codec_score(fmt.get("vcodec"), _CLIP_VIDEO_CODECS)
+                + (0.3 if fmt.get("ext") == "mp4" else 0.0)
+                - 0.5 * (fmt.get("tbr") or 0) / max_rate)
+
+    def audio_score(fmt):
+        return (_codec_score(fmt.get("acodec"), _CLIP_AUDIO_CODECS)
+                + (0.3 if fmt.get("ext") in ("m4a", "mp4") else 0.0)
+                + 0.5 * (fmt.get("abr") or fmt.get("tbr") or 0) / max_abr)
+
+    best_audio = max(audios, key=audio_score, default=None)
+    candidates = []
+    for fmt in videos:
+        if _has(fmt.get("acodec")):
+            candidates.append((video_score(fmt) + _codec_score(fmt.get("acodec"), _CLIP_AUDIO_CODECS), [fmt]))
+        elif best_audio is not None:
+            candidates.append((video_score(fmt) + audio_score(best_audio), [fmt, best_audio]))
+        else:
+            candidates.append((video_score(fmt), [fmt]))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    score, chosen = candidates[0]
+    spec = "+".join(fmt["format_id"] for fmt in chosen)
+    reason = f"{' + '.join(map(_describe, chosen))}, score {score:.2f}"
+    if _codec_score(chosen[0].get("vcodec"), _CLIP_VIDEO_CODECS) >= 0.8:
+        reason += "; stream-copies and smart-cuts cleanly"
+    if len(candidates) > 1:
+        runner_up, others = candidates[1]
+        reason += f"; over {' + '.join(map(_describe, others))}, score {runner_up:.2f}"
+    return spec, reason
+
+def resolve_formats(info, format_spec, ydl_opts=None):
+    """The format dicts yt-dlp selects for format_spec (one muxed, or video and audio), without downloading."""
+    import yt_dlp
+    opts = {**_QUIET_OPTS, **(ydl_opts or {}), "format": format_spec}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        # Processing annotates the dict; keep the caller's copy reusable for the download.
+        result = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    return result.get("requested_formats") or [result]
+
+def fetch_range(formats, start_sec, end_sec, output_file, on_progress=None):
+    """
+    Copies start_sec..end_sec of the selected formats into an MP4 with ffmpeg, which seeks
+    over HTTP so only the bytes covering the range are transferred. The pre-roll from the
+    keyframe before start_sec is kept behind an edit list, so t=0 of the piece is exactly
+    start_sec of the source.
+    """
+    duration = end_sec - start_sec
+    cmd = ["ffmpeg", "-y"]
+    maps = []
+    for index, fmt in enumerate(formats):
+        headers = "".join(f"{key}: {value}\r\n" for key, value in (fmt.get("http_headers") or {}).items())
+        if headers and fmt["url"].startswith("http"):
+            cmd += ["-headers", headers]
+        cmd += ["-ss", f"{start_sec:.3f}", "-i", fmt["url"]]
+        if fmt.get("vcodec") != "none":
+            maps += ["-map", f"{index}:v:0?"]
+        if fmt.get("acodec") != "none":
+            maps += ["-map", f"{index}:a:0?"]
+    cmd += [*maps, "-t", f"{duration:.3f}", "-c", "copy", "-f", "mp4", str(output_file)]
+    run_ffmpeg(cmd, duration=duration, on_progress=on_progress)
+
+def _ffmpeg_status(filename, progress):
+    """An ffmpeg progress dict (see core.ffmpeg.run_ffmpeg) in the shape of a yt-dlp progress hook dict."""
+    size = progress.get("size") or 0
+    total = size * 100 / progress["percent"] if size and progress.get("percent") else None
+    return {
+        "status": "finished" if progress["done"] else "downloading",
+        "filename": filename,
+        "downloaded_bytes": size,
+        "total_bytes_estimate": total,
     }
 
-    def _download():
+class FragmentTuner:
+    """
+    Chooses concurrent_fragment_downloads for fragmented (DASH/HLS) downloads per key
+    (the extractor, i.e. roughly the CDN) by hill climbing on measured throughput.
+    yt-dlp fixes the concurrency for the length of a download, so every finished
+    download reports the speed it got at its level: the tuner keeps doubling the level
+    while speed improves by at least `gain`, and backs off to the fastest level seen
+    once it stops improving. Speeds are smoothed, so later reports can move it again.
+    """
+    def __init__(self, initial=4, maximum=MAX_CONCURRENT_FRAGMENTS, gain=0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.gain = gain
+        self._state = {}  # key -> {"current": level, "speeds": {level: bytes/s}}
+        self._lock = threading.Lock()
+
+    def suggest(self, key):
+        with self._lock:
+            state = self._state.get(key)
+            return state["current"] if state else self.initial
+
+    def report(self, key, level, speed):
+        if not speed:
+            return
+        with self._lock:
+            state = self._state.setdefault(key, {"current": self.initial, "speeds": {}})
+            speeds = state["speeds"]
+            speeds[level] = speed if level not in speeds else (speeds[level] + speed) / 2
+            if level != state["current"]:
+                return  # Measured at a level the tuner has already moved away from
+            lower = [speeds[other] for other in speeds if other < level]
+            higher = min(level * 2, self.maximum)
+            improving = not lower or speeds[level] >= max(lower) * (1 + self.gain)
+            if improving and higher != level and (higher not in speeds or speeds[higher] > speeds[level]):
+                state["current"] = higher
+            elif not improving:
+                state["current"] = max(speeds, key=speeds.get)
+
+class DownloadProgress:
+    """
+    Turns the yt-dlp progress hook calls of one job into download_progress events, at
+    most one every `interval` seconds plus one for every finished file. Each event carries
+    the current file's downloaded/total bytes, instantaneous and average speed (bytes/s),
+    ETA (seconds), percent and fragment counters, and job_bytes for all of the job's files.
+    """
+    def __init__(self, job, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        self.job = job
+        self.clock = clock
+        self.throttle = Throttle(interval)
+        self._files = {}  # filename -> bytes transferred
+        self._started = {}
+        self._last = None  # (filename, time, bytes) of the previous report
+        self.started_at = None  # First progress report, so extraction time is not counted
+        self.fragmented = False  # True once a DASH/HLS fragment counter was reported
+
+    @property
+    def average_speed(self):
+        """Bytes per second over the whole job so far."""
+        if self.started_at is None:
+            return None
+        elapsed = self.clock() - self.started_at
+        return self.downloaded_bytes / elapsed if elapsed > 0 else None
+
+    @property
+    def downloaded_bytes(self):
+        return sum(self._files.values())
+
+    def update(self, status):
+        filename = status.get("filename")
+        finished = status.get("status") == "finished"
+        if status.get("status") not in ("downloading", "finished") or status.get("downloaded_bytes") is None:
+            # e.g. a file already on disk, which yt-dlp reports as finished without transferring anything
+            return
+        now = self.clock()
+        if self.started_at is None:
+            self.started_at = now
+        if status.get("fragment_count"):
+            self.fragmented = True
+        done = status.get("downloaded_bytes") or 0
+        if finished:
+            # The final report of a file never takes back bytes already counted.
+            done = max(done, self._files.get(filename, 0))
+        total = status.get("total_bytes") or status.get("total_bytes_estimate")
+        self._files[filename] = done
+        self._started.setdefault(filename, now)
+
+        speed = status.get("speed")
+        if speed is None and self._last is not None and self._last[0] == filename and now > self._last[1]:
+            speed = (done - self._last[2]) / (now - self._last[1])
+        self._last = (filename, now, done)
+        elapsed = status.get("elapsed") or now - self._started[filename]
+        average = done / elapsed if elapsed > 0 else None
+        eta = status.get("eta")
+        if eta is None and total and average:
+            eta = max(total - done, 0) / average
+
+        if not self.throttle.ready(force=finished):
+            return
+        event_bus.publish("download_progress", self.job.event_data(
+            filename=filename,
+            downloaded_bytes=done,
+            total_bytes=total,
+            job_bytes=self.downloaded_bytes,
+            percent=min(100.0, done / total * 100) if total else None,
+            speed=speed,
+            average_speed=average,
+            eta=eta,
+            fragment_index=status.get("fragment_index"),
+            fragment_count=status.get("fragment_count"),
+            done=finished,
+        ))
+
+class TransferStats:
+    """
+    Byte and time accounting for a DownloadManager session. mean_speed is measured over
+    the wall-clock time in which at least one download was running, so with concurrent
+    downloads it is the throughput the link actually delivered.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.downloads = 0
+        self.failed = 0
+        self.bytes = 0
+        self._busy = 0.0
+        self._active = 0
+        self._since = None
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            if self._active == 0:
+                self._since = self.clock()
+            self._active += 1
+
+    def finished(self, nbytes, complete=True):
+        with self._lock:
+            self.bytes += nbytes
+            if complete:
+                self.downloads += 1
+            else:
+                self.failed += 1
+            self._active -= 1
+            if self._active == 0:
+                self._busy += self.clock() - self._since
+
+    def summary(self):
+        with self._lock:
+            busy = self._busy
+            if self._active:
+                busy += self.clock() - self._since
+            return {
+                "downloads": self.downloads,
+                "failed": self.failed,
+                "bytes": self.bytes,
+                "seconds": round(busy, 3),
+                "mean_speed": self.bytes / busy if busy > 0 else None,
+            }
+
+class DownloadJob:
+    """One queued download. state is queued, running, complete, failed or cancelled."""
+    def __init__(self, job_id, url, resolution, auto_load, priority, info=None):
+        self.id = job_id
+        self.url = url
+        self.info = info
+        self.resolution = resolution
+        self.auto_load = auto_load
+        self.priority = priority
+        self.state = "queued"
+        self.filename = None
+        # Set instead of merging into filename when the manager keeps streams separate.
+        self.audio_filename = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.progress = None
+        self.reused = False  # True when the file came from the media library
+        # Called with the job once it has finished, whatever the outcome.
+        self.on_done = None
+        # Range-only downloads: the trim queue whose jobs for url decide what is fetched.
+        self.trim_store = None
+        self.trim_ids = None
+        self.auto_trim = True
+        self.trim_mode = "copy"
+        self.margin = DEFAULT_RANGE_MARGIN
+        self.pieces = []
+        self.trim_thread = None
+
+    @property
+    def finished(self):
+        return self.state in ("complete", "failed", "cancelled")
+
+    def event_data(self, **extra):
+        return {"job_id": self.id, "url": self.url, **extra}
+
+class DownloadManager:
+    """
+    Download queue with a bounded number of concurrent downloads.
+    Jobs run in priority order (lower first, FIFO among equals) on worker threads
+    that are started on demand. Publishes download_queued, download_started,
+    download_format_chosen (clip format policy), download_progress, download_complete,
+    download_failed and download_cancelled with the job id, and download_session_stats
+    (see TransferStats) whenever the queue drains.
+    With separate_streams, a video+audio selection is saved as two files instead of
+    being merged; download_complete then carries the audio file as well. It also
+    carries the auto_load flag the job was submitted with.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT_DOWNLOADS, ydl_opts=None, library=media_library,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, format_policy="default", separate_streams=False):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.set_format_policy(format_policy)
+        self.separate_streams = separate_streams
+        self.tuner = FragmentTuner()
+        self.set_concurrent_fragments(concurrent_fragments)
+        # Finished downloads are catalogued here and reused instead of fetched again.
+        self.library = library
+        # Extra YoutubeDL options applied to every download (e.g. quiet output for the CLI).
+        self.ydl_opts = dict(ydl_opts or {})
+        self._queue = queue.PriorityQueue()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._workers = 0
+        self._feeds = 0
+        self._publishing = 0  # _finish calls still publishing their events
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self.stats = TransferStats()
+
+    def submit(self, url, resolution="best", auto_load=False, priority=0, info=None, on_done=None):
+        """
+        Queues url; an already extracted info dict may be given to skip extraction.
+        on_done(job) is called on the worker thread once the job has finished.
+        """
+        job = DownloadJob(next(self._ids), url, resolution, auto_load, priority, info)
+        job.on_done = on_done
+        return self._enqueue(job)
+
+    def submit_ranges(self, url, ranges=None, store=None, resolution="best", priority=0,
+                      margin=DEFAULT_RANGE_MARGIN, trim_mode="copy", job_ids=None, trim=True, on_done=None):
+        """
+        Queues a download of only the parts of url that are going to be trimmed, each
+        widened by margin seconds, and hands the fetched pieces straight to core.trimmer.
+        The ranges are the unfinished trim jobs in store whose video is url; explicit
+        (start, end) ranges (seconds or "HH:MM:SS") are added to it first. Without a
+        store, a throwaway in-memory one is used. Before trimming, the jobs are pointed
+        at their piece with start/end relative to it, so a resumed queue reuses the pieces.
+        job_ids limits the download to those jobs of store; with trim=False the pieces are
+        left for the caller (see core.pipeline) instead of being trimmed right away.
+        """
+        if store is None:
+            store = JobStore(":memory:")
+        for start, end in ranges or ():
+            store.add(range_task(url, start, end))
+        job = DownloadJob(next(self._ids), url, resolution, False, priority)
+        job.trim_store = store
+        job.trim_ids = set(job_ids) if job_ids is not None else None
+        job.auto_trim = trim
+        job.trim_mode = trim_mode
+        job.margin = margin
+        job.on_done = on_done
+        return self._enqueue(job)
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queue.put((job.priority, next(self._seq), job))
+        event_bus.publish("download_queued", job.event_data())
+        self._spawn_workers()
+        return job
+
+    def submit_many(self, entries, resolution="best", auto_load=False, priority=0,
+                    lookahead=DEFAULT_LOOKAHEAD, skip=already_downloaded):
+        """
+        Feeds an iterable of entries (URLs or dicts from iter_playlist_entries) into the
+        queue from a background thread, keeping at most `lookahead` jobs queued but not
+        started (at least one), so a lazily listed playlist starts downloading while it is
+        still being read. Entries for which skip(entry, resolution) is true (by default, videos already in
+        the media library) are dropped before any format resolution.
+        Publishes download_entry_skipped and, at the end, download_feed_complete.
+        """
+        # With no look-ahead slot the feeder would wait forever.
+        lookahead = max(1, int(lookahead))
+        with self._lock:
+            self._feeds += 1
+
+        def _feed():
+            queued = skipped = 0
+            try:
+                for entry in entries:
+                    if isinstance(entry, str):
+                        entry = {"url": entry}
+                    if skip is not None and skip(entry, resolution):
+                        skipped += 1
+                        event_bus.publish("download_entry_skipped", {k: v for k, v in entry.items() if k != "info"})
+                        continue
+                    with self._done:
+                        self._done.wait_for(lambda: self._pending() < lookahead)
+                    self.submit(entry["url"], resolution, auto_load, priority, entry.get("info"))
+                    queued += 1
+            except Exception as e:
+                event_bus.publish("download_feed_failed", {"error": str(e)})
+            finally:
+                # Published before the feed counts as drained, so wait() returns after it.
+                event_bus.publish("download_feed_complete", {"queued": queued, "skipped": skipped})
+                with self._done:
+                    self._feeds -= 1
+                    self._done.notify_all()
+
+        thread = threading.Thread(target=_feed, daemon=True)
+        thread.start()
+        return thread
+
+    def _pending(self):
+        # Caller holds the lock.
+        return sum(1 for job in self._jobs.values() if job.state == "queued")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _engine_key(self, job):
+        """core.engine job key of a download; job ids are only unique within one manager."""
+        return ("download", id(self), job.id)
+
+    def cancel(self, job_id):
+        """Cancels a queued job, or aborts a running one, killing any ffmpeg it runs."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        if job.state == "queued":
+            self._finish(job, "cancelled")
+        else:
+            subprocess_engine.cancel(self._engine_key(job))
+        return True
+
+    def pause(self, job_id):
+        """
+        Pauses a job: its ffmpeg process is stopped and yt-dlp's transfer waits at its next
+        progress update. A queued job waits for resume() once a worker picks it up.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        subprocess_engine.pause(self._engine_key(job))
+        return True
+
+    def resume(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return False
+        subprocess_engine.resume(self._engine_key(job))
+        return True
+
+    def set_concurrent_fragments(self, concurrent_fragments):
+        """Fragments fetched in parallel within one DASH/HLS download: a number, or "auto" to tune it."""
+        if concurrent_fragments != "auto":
+            concurrent_fragments = min(max(1, int(concurrent_fragments)), MAX_CONCURRENT_FRAGMENTS)
+        self.concurrent_fragments = concurrent_fragments
+
+    def set_format_policy(self, format_policy):
+        if format_policy not in FORMAT_POLICIES:
+            raise ValueError(f"Unknown format policy: {format_policy}")
+        self.format_policy = format_policy
+
+    def set_separate_streams(self, separate_streams):
+        """Keep video and audio as separate files (trimmed together by core.trimmer) instead of merging them."""
+        self.separate_streams = bool(separate_streams)
+
+    def _format_spec(self, job, info):
+        """yt-dlp format string for a job under the manager's format policy."""
+        if self.format_policy == "clip":
+            choice = clip_format(info, job.resolution)
+            if choice is None:
+                spec = build_format(job.resolution)
+                reason = "formats list no codecs; using the default selection"
+            else:
+                spec, reason = choice
+            event_bus.publish("download_format_chosen", job.event_data(format=spec, reason=reason))
+            return spec
+        return build_format(job.resolution)
+
+    def _fragment_level(self, info):
+        if self.concurrent_fragments == "auto":
+            return self.tuner.suggest(info.get("extractor_key") or "generic")
+        return self.concurrent_fragments
+
+    def set_max_concurrent(self, max_concurrent):
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+        self._spawn_workers()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every feed is drained and every job has finished and published its
+        events (on_done included). Returns False on timeout.
+        """
+        with self._done:
+            return self._done.wait_for(
+                lambda: self._feeds == 0 and not self._publishing and all(job.finished for job in self._jobs.values()),
+                timeout
+            )
+
+    def _spawn_workers(self):
+        with self._lock:
+            missing = min(self.max_concurrent, self._queue.qsize()) - self._workers
+            self._workers += max(missing, 0)
+        for _ in range(missing):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        while True:
+            # Queue hand-off and worker accounting share the lock with submit(),
+            # so a job queued while this worker is retiring still gets a worker.
+            with self._lock:
+                if self._workers > self.max_concurrent:
+                    self._workers -= 1
+                    return
+                try:
+                    _, _, job = self._queue.get_nowait()
+                except queue.Empty:
+                    self._workers -= 1
+                    return
+            if job.cancel_event.is_set():
+                continue
+            self._run(job)
+
+    def _finish(self, job, state, **extra):
+        with self._done:
+            if job.finished:
+                return
+            if job.state == "running":
+                self.stats.finished(job.progress.downloaded_bytes, state == "complete")
+            job.state = state
+            # Summarize the session once the last running job ends.
+            idle = job.progress is not None and self._feeds == 0 and all(other.finished for other in self._jobs.values())
+            self._publishing += 1
+            self._done.notify_all()
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                event_bus.publish("download_complete", filename)
+            # A pause or cancel on a job that never ran would otherwise be kept.
+            subprocess_engine.release(self._engine_key(job))
+            event_bus.publish(f"download_{state}", job.event_data(**extra))
+            if job.on_done is not None:
+                job.on_done(job)
+            if idle:
+                event_bus.publish("download_session_stats", self.stats.summary())
+        finally:
+            with self._done:
+                self._publishing -= 1
+                self._done.notify_all()
+
+    def _run(self, job):
+        with self._done:
+            # cancel() may have landed since the worker took the job off the queue;
+            # it finishes a job that is still queued itself.
+            if job.cancel_event.is_set() or job.finished:
+                return
+            job.state = "running"
+            job.progress = DownloadProgress(job)
+            self.stats.started()
+            self._done.notify_all()  # Frees a look-ahead slot for submit_many
+        event_bus.publish("download_started", job.event_data())
+        try:
+            from yt_dlp.utils import DownloadCancelled, DownloadError
+        except ImportError as e:
+            job.error = str(e)
+            self._finish(job, "failed", error=job.error)
+            return
+
+        def _on_progress(status):
+            if job.cancel_event.is_set():
+                raise DownloadCancelled()
+            job.progress.update(status)
+
+        try:
+            # Waits here if the job was paused while queued.
+            with subprocess_engine.job(self._engine_key(job)):
+                # One extraction serves both the file name and the download itself.
+                cached = job.info is not None or metadata_cache.get(job.url) is not None
+                info = job.info or extract_info(job.url)
+                if job.cancel_event.is_set():
+                    raise DownloadCancelled()
+                download = self._download_ranges if job.trim_store is not None else self._download_file
+                try:
+                    download(job, info, _on_progress)
+                except (DownloadError, subprocess.CalledProcessError):
+                    if not cached:
+                        raise
+                    # Format URLs in a cached info dict may have expired; extract afresh once.
+                    download(job, extract_info(job.url, refresh=True), _on_progress)
+        except (DownloadCancelled, JobCancelled):
+            self._finish(job, "cancelled")
         except Exception as e:
-            event_bus.publish("download_failed", str(e))
+            job.error = str(e)
+            self._finish(job, "failed", error=job.error)
+        else:
+            if job.pieces:
+                self._finish(job, "complete", filename=job.filename, pieces=job.pieces)
+            elif job.reused:
+                self._finish(job, "complete", filename=job.filename, audio=job.audio_filename, reused=True,
+                             auto_load=job.auto_load)
+            else:
+                self._finish(job, "complete", filename=job.filename, audio=job.audio_filename, auto_load=job.auto_load)
+
+    def _download_file(self, job, info, on_progress):
+        import yt_dlp
+        from yt_dlp.utils import DownloadCancelled
+        # Resolve the exact format first: the library is keyed by video and format id.
+        spec = self._format_spec(job, info)
+        formats = resolve_formats(info, spec, self.ydl_opts)
+        format_ids = [fmt.get("format_id") or "" for fmt in formats]
+        # Separate streams skip the merge: each is its own download and library entry.
+        separate = self.separate_streams and len(formats) == 2
+        key = info_key(info)
+        if self.library is not None and key is not None:
+            entries = [self.library.get(key, format_id) for format_id in (format_ids if separate else ["+".join(format_ids)])]
+            if all(entries):
+                job.filename = entries[0]["path"]
+                job.audio_filename = entries[1]["path"] if separate else None
+                job.reused = True
+                return
+        stem = f"{output_stem(info)}.f%(format_id)s" if separate else output_stem(info)
+        output_path = os.path.join(os.getcwd(), "videos/downloads/", f"{stem}.%(ext)s")
+        fragments = self._fragment_level(info)
+        key = self._engine_key(job)
+
+        def _hook(status):
+            # yt-dlp's transfers do not run on the engine: hold them here while paused.
+            try:
+                subprocess_engine.wait_if_paused(key)
+            except JobCancelled:
+                raise DownloadCancelled()
+            on_progress(status)
+
+        ydl_opts = {
+            **self.ydl_opts,
+            "format": ",".join(format_ids) if separate else "+".join(format_ids) or spec,
+            "outtmpl": output_path,
+            "progress_hooks": [_hook],
+            "concurrent_fragment_downloads": fragments,
+            # The output name is stable, so an interrupted or cancelled download
+            # resumes from its .part file (and fragment state) on the next attempt.
+            "continuedl": True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            result = ydl.process_ie_result(info, download=True)
+            if separate:
+                # A "video,audio" selection downloads each format on its own, in that order.
+                downloads = result.get("requested_downloads") or ()
+                paths = {download.get("format_id"): download.get("filepath") for download in downloads}
+                job.filename, job.audio_filename = (paths.get(format_id) for format_id in format_ids)
+                if not job.filename or not job.audio_filename:
+                    raise ValueError(f"Expected separate video and audio files for {job.url}")
+            else:
+                job.filename = downloaded_path(ydl, result)
+        if job.progress.fragmented and self.concurrent_fragments == "auto":
+            self.tuner.report(info.get("extractor_key") or "generic", fragments, job.progress.average_speed)
+        if self.library is not None:
+            if separate:
+                # requested_downloads only hold format fields; the video's own come from result.
+                for download in downloads:
+                    self.library.add({**result, **download}, download["filepath"], job.url, job.resolution)
+            else:
+                self.library.add(result, job.filename, job.url, job.resolution)
+
+    def _download_ranges(self, job, info, on_progress):
+        """Fetches the pieces covering job.trim_store's ranges for the URL, then starts trimming them."""
+        ranges = pending_trim_ranges(job.trim_store, job.url, job.trim_ids)
+        if not ranges:
+            raise ValueError(f"No pending trim ranges for {job.url}")
+        formats = resolve_formats(info, self._format_spec(job, info), self.ydl_opts)
+        download_dir = os.path.join(os.getcwd(), "videos", "downloads")
+        os.makedirs(download_dir, exist_ok=True)
+
+        tasks = []
+        pieces = []
+        for piece_start, piece_end, members in merge_ranges([(r["start"], r["end"]) for r in ranges], job.margin):
+            name = f"{output_stem(info)} [{round(piece_start * 1000)}-{round(piece_end * 1000)}ms]"
+            piece = os.path.join(download_dir, name + ".mp4")
+            if not os.path.exists(piece):
+                partial = os.path.join(download_dir, name + ".part.mp4")
+                try:
+                    fetch_range(formats, piece_start, piece_end, partial,
+                                on_progress=lambda progress: on_progress(_ffmpeg_status(piece, progress)))
+                except BaseException:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+                    raise
+                os.replace(partial, piece)
+            pieces.append(piece)
+            for index in members:
+                tasks.append((ranges[index]["job_id"], piece, ranges[index]["start"] - piece_start, ranges[index]["end"] - piece_start))
+
+        for job_id, piece, start_sec, end_sec in tasks:
+            job.trim_store.retarget(job_id, piece, seconds_to_time(start_sec), seconds_to_time(end_sec))
+        job.pieces = pieces
+        job.filename = pieces[0]
+        if job.auto_trim:
+            job.trim_thread = process_trim_tasks(job.trim_store, mode=job.trim_mode, job_ids=[t[0] for t in tasks])
 
-    threading.Thread(target=_download, daemon=True).start()
+# Global download manager instance
+download_manager = DownloadManager()
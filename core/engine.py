@@ -0,0 +1,265 @@
+import asyncio
+import collections
+import contextlib
+import os
+import signal
+import threading
+
+# Seconds shutdown() waits for running jobs to clean up after killing their processes.
+SHUTDOWN_TIMEOUT = 5.0
+# Lines of a process's stderr kept for error messages.
+STDERR_TAIL_LINES = 40
+# Largest piece of raw stdout handed to a run's on_data at once.
+READ_CHUNK_BYTES = 256 * 1024
+
+class JobCancelled(Exception):
+    """Raised on the worker thread of a job that was cancelled (or when the engine shuts down)."""
+
+class _Control:
+    """Cancel/pause flags of one job key and the processes currently running for it."""
+    def __init__(self):
+        self.cancelled = False
+        self.paused = False
+        self.processes = set()
+        self.active = 0  # open job() scopes using this key
+
+def _signal_group(proc, action):
+    """Kills ("kill"), stops ("stop") or continues ("cont") the process group of proc (its own session)."""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            # No process groups or SIGSTOP on Windows: only killing is supported.
+            if action == "kill":
+                proc.kill()
+        else:
+            os.killpg(proc.pid, {"kill": signal.SIGKILL, "stop": signal.SIGSTOP, "cont": signal.SIGCONT}[action])
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class SubprocessEngine:
+    """
+    Runs external processes (ffmpeg) as asyncio subprocesses on one background event
+    loop, shared by the trimmer and the downloader. Worker threads open a job(*keys)
+    scope and call run() inside it, which blocks the worker, never the loop.
+    cancel(), pause() and resume() take a job key such as ("trim", 3) and can be called
+    from any thread, e.g. the Tk main loop or a headless runner's signal handler:
+    cancelling kills the job's whole process group and makes run() raise JobCancelled,
+    pausing stops the group (SIGSTOP) and holds back the job's next process until
+    resumed. Outputs of a run that does not complete are deleted. shutdown() cancels
+    everything and waits for the jobs to clean up.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._controls = {}
+        self._closed = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._local = threading.local()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="subprocess-engine", daemon=True).start()
+            return self._loop
+
+    def _control(self, key):
+        control = self._controls.get(key)
+        if control is None:
+            control = self._controls[key] = _Control()
+        return control
+
+    def _signal(self, controls, action):
+        procs = [proc for control in controls for proc in control.processes]
+        if procs and self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: [_signal_group(proc, action) for proc in procs])
+
+    def _check(self, keys):
+        """Blocks while any of keys is paused; raises JobCancelled if cancelled. Lock held."""
+        while True:
+            controls = [self._control(key) for key in keys]
+            if self._closed or any(control.cancelled for control in controls):
+                raise JobCancelled()
+            if not any(control.paused for control in controls):
+                return controls
+            self._changed.wait()
+
+    @contextlib.contextmanager
+    def job(self, *keys):
+        """
+        Scope of a worker running processes for keys; several keys when one process
+        serves several jobs (e.g. a multi-output trim pass). Waits here while paused.
+        run() calls on this thread inside the scope belong to these keys.
+        """
+        with self._changed:
+            for control in self._check(keys):
+                control.active += 1
+        outer = getattr(self._local, "keys", ())
+        self._local.keys = keys
+        try:
+            yield
+        finally:
+            self._local.keys = outer
+            with self._changed:
+                for key in keys:
+                    control = self._controls.get(key)
+                    if control is not None:
+                        control.active -= 1
+                        if not control.active:
+                            # Done with this key; a cancel that arrived meanwhile dies with it.
+                            del self._controls[key]
+                self._changed.notify_all()
+
+    def wait_if_paused(self, *keys):
+        """For work not run through run() (e.g. yt-dlp's own transfers): blocks while paused, raises JobCancelled if cancelled."""
+        with self._changed:
+            self._check(keys)
+
+    def run(self, cmd, keys=None, on_line=None, outputs=(), on_data=None, on_stderr=None):
+        """
+        Runs cmd for the job keys, by default those of the enclosing job() scope, and
+        blocks until it exits. on_line gets each stdout line on the engine's loop thread
+        and may raise to abort the run, which kills the process group and re-raises here.
+        For binary output (e.g. raw PCM), on_data gets stdout as bytes instead, in chunks
+        of up to READ_CHUNK_BYTES of any length. on_stderr gets each stderr line on the
+        loop thread too; lines it returns True for are left out of the tail. Returns
+        (returncode, stderr tail). The files in outputs are removed unless the process
+        exits with status 0.
+        """
+        if keys is None:
+            keys = getattr(self._local, "keys", ())
+        with self._changed:
+            controls = self._check(keys)
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run(cmd, controls, on_line, on_data, on_stderr), loop)
+        try:
+            returncode, tail = future.result()
+        except BaseException:
+            _remove(outputs)
+            raise
+        if returncode != 0:
+            _remove(outputs)
+            with self._lock:
+                if self._closed or any(control.cancelled for control in controls):
+                    raise JobCancelled()
+        return returncode, tail
+
+    async def _run(self, cmd, controls, on_line, on_data, on_stderr):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=os.name != "nt",
+        )
+        with self._lock:
+            for control in controls:
+                control.processes.add(proc)
+            # Cancelled or paused between the check in run() and the spawn.
+            if self._closed or any(control.cancelled for control in controls):
+                _signal_group(proc, "kill")
+            elif any(control.paused for control in controls):
+                _signal_group(proc, "stop")
+        tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        stderr = asyncio.ensure_future(self._drain(proc.stderr, tail, on_stderr))
+        try:
+            if on_data is not None:
+                while True:
+                    data = await proc.stdout.read(READ_CHUNK_BYTES)
+                    if not data:
+                        break
+                    on_data(data)
+            else:
+                async for line in proc.stdout:
+                    if on_line is not None:
+                        on_line(line.decode("utf-8", "replace"))
+            returncode = await proc.wait()
+        except BaseException:
+            _signal_group(proc, "kill")
+            await proc.wait()
+            raise
+        finally:
+            await stderr
+            with self._lock:
+                for control in controls:
+                    control.processes.discard(proc)
+        return returncode, "\n".join(tail)
+
+    @staticmethod
+    async def _drain(stream, tail, on_stderr=None):
+        async for line in stream:
+            line = line.decode("utf-8", "replace").rstrip()
+            if on_stderr is None or not on_stderr(line):
+                tail.append(line)
+
+    def cancel(self, key):
+        with self._changed:
+            control = self._control(key)
+            control.cancelled = True
+            control.paused = False
+            self._signal([control], "kill")
+            self._changed.notify_all()
+
+    def pause(self, key):
+        with self._changed:
+            control = self._control(key)
+            if not control.cancelled:
+                control.paused = True
+                self._signal([control], "stop")
+
+    def resume(self, key):
+        with self._changed:
+            control = self._controls.get(key)
+            if control is None or not control.paused:
+                return
+            control.paused = False
+            self._signal([control], "cont")
+            if not control.active:
+                del self._controls[key]
+            self._changed.notify_all()
+
+    def is_cancelled(self, key):
+        with self._lock:
+            control = self._controls.get(key)
+            return self._closed or (control is not None and control.cancelled)
+
+    def release(self, key):
+        """Forgets the flags of an idle key, e.g. a cancel for a job that never ran."""
+        with self._lock:
+            control = self._controls.get(key)
+            if control is not None and not control.active:
+                del self._controls[key]
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Kills every process group, makes current and future runs raise JobCancelled and
+        waits up to timeout seconds for the jobs to leave their scopes (and remove their
+        partial outputs). Returns False if some were still running.
+        """
+        with self._changed:
+            self._closed = True
+            controls = list(self._controls.values())
+            for control in controls:
+                control.cancelled = True
+                control.paused = False
+            # Stopped processes do not act on SIGKILL until continued on some systems.
+            self._signal(controls, "cont")
+            self._signal(controls, "kill")
+            self._changed.notify_all()
+            done = self._changed.wait_for(
+                lambda: not any(control.active for control in self._controls.values()), timeout
+            )
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        return done
+
+# Global engine instance
+subprocess_engine = SubprocessEngine()
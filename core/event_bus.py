@@ -1,16 +1,50 @@
+import threading
+import time
+
+class Throttle:
+    """Lets an action through at most once every `interval` seconds (forced calls always pass)."""
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = None
+        self._lock = threading.Lock()
+
+    def ready(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if force or self._last is None or now - self._last >= self.interval:
+                self._last = now
+                return True
+            return False
+
 class EventBus:
+    """
+    Callbacks run synchronously on the publishing thread, unless they were subscribed
+    with a dispatcher: an object whose dispatch(event_name, callback, data) delivers the
+    call elsewhere (see gui.tk_dispatcher.TkDispatcher for the Tk main loop).
+    """
     def __init__(self):
         self.subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_name, callback, dispatcher=None):
+        with self._lock:
+            self.subscribers.setdefault(event_name, []).append((callback, dispatcher))
 
-    def subscribe(self, event_name, callback):
-        if event_name not in self.subscribers:
-            self.subscribers[event_name] = []
-        self.subscribers[event_name].append(callback)
+    def unsubscribe(self, event_name, callback):
+        with self._lock:
+            self.subscribers[event_name] = [
+                entry for entry in self.subscribers.get(event_name, []) if entry[0] != callback
+            ]
 
     def publish(self, event_name, data=None):
-        if event_name in self.subscribers:
-            for callback in self.subscribers[event_name]:
+        # Workers publish while the GUI subscribes; iterate over a snapshot.
+        with self._lock:
+            subscribers = list(self.subscribers.get(event_name, ()))
+        for callback, dispatcher in subscribers:
+            if dispatcher is None:
                 callback(data)
+            else:
+                dispatcher.dispatch(event_name, callback, data)
 
 # Global event bus instance
 event_bus = EventBus()
@@ -0,0 +1,77 @@
+import subprocess
+from core.engine import subprocess_engine
+
+def _parse_speed(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def probe_duration(media_file):
+    """Container duration of media_file in seconds (ffprobe); ValueError if it has none."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "csv=print_section=0",
+        media_file
+    ]
+    result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        raise ValueError(f"Unknown duration: {media_file}")
+
+def run_ffmpeg(cmd, duration=None, on_progress=None, outputs=None):
+    """
+    Runs an ffmpeg command line on core.engine's subprocess engine, as part of the
+    calling thread's current engine job, with machine-readable progress on stdout
+    (-progress pipe:1) read incrementally instead of buffering ffmpeg's whole output.
+    on_progress receives a dict with out_time (seconds), size (bytes written), fps, speed
+    and percent (None unless duration is given) after every progress block ffmpeg emits; if it
+    raises, ffmpeg is killed and the exception propagates. outputs (by default the
+    last argument, ffmpeg's output file) are deleted if the run does not succeed.
+    Raises subprocess.CalledProcessError carrying the tail of ffmpeg's log on failure,
+    core.engine.JobCancelled if the job was cancelled.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    block = {}
+
+    def _on_line(line):
+        nonlocal block
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return
+        if key != "progress":
+            block[key] = value
+            return
+        if on_progress is not None:
+            # out_time_ms is in microseconds as well, despite its name.
+            out_time_us = _parse_float(block.get("out_time_us", block.get("out_time_ms")))
+            out_time = max(out_time_us / 1e6, 0.0) if out_time_us is not None else None
+            if value == "end" and duration:
+                out_time = duration
+            percent = None
+            if duration and out_time is not None:
+                percent = min(100.0, out_time / duration * 100)
+            size = _parse_float(block.get("total_size"))
+            on_progress({
+                "out_time": out_time,
+                "size": int(size) if size is not None else None,
+                "fps": _parse_float(block.get("fps")),
+                "speed": _parse_speed(block.get("speed")),
+                "percent": percent,
+                "done": value == "end",
+            })
+        block = {}
+
+    if outputs is None:
+        outputs = [cmd[-1]]
+    returncode, tail = subprocess_engine.run(cmd, on_line=_on_line, outputs=outputs)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=tail)
@@ -0,0 +1,220 @@
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from core.engine import subprocess_engine
+from core.ffmpeg import probe_duration, run_ffmpeg
+from core.paths import cache_dir, signature_key
+
+# One thumbnail every DEFAULT_INTERVAL seconds, TILE_WIDTH x TILE_HEIGHT pixels each
+# (letterboxed), packed SHEET_COLUMNS x SHEET_ROWS to a PNG sprite sheet.
+DEFAULT_INTERVAL = 5
+TILE_WIDTH = 160
+TILE_HEIGHT = 90
+SHEET_COLUMNS = 10
+SHEET_ROWS = 3
+
+_META = "meta.json"
+_SHEET_PATTERN = "sheet_%03d.png"
+# A strip is generated in a work directory next to its final one and renamed into place
+# when complete. A work directory that has not changed for this long belongs to a
+# process that died and is removed.
+_STALE_SECONDS = 24 * 3600
+
+_memory_cache = {}
+_lock = threading.Lock()
+
+class Filmstrip:
+    """
+    Thumbnails of a video taken every `interval` seconds, stored as sprite sheets in
+    directory. count is the number of thumbnails, known up front from the duration;
+    complete is False while the sheets are still being generated.
+    """
+
+    def __init__(self, directory, duration, interval=DEFAULT_INTERVAL, tile_width=TILE_WIDTH,
+                 tile_height=TILE_HEIGHT, columns=SHEET_COLUMNS, rows=SHEET_ROWS, complete=False):
+        self.directory = directory
+        self.duration = duration
+        self.interval = interval
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns
+        self.rows = rows
+        self.count = max(1, math.ceil(duration / interval))
+        self.complete = complete
+
+    @property
+    def per_sheet(self):
+        return self.columns * self.rows
+
+    @property
+    def sheet_count(self):
+        return math.ceil(self.count / self.per_sheet)
+
+    def sheet_path(self, sheet):
+        return self.directory / (_SHEET_PATTERN % (sheet + 1))
+
+    def has_sheet(self, sheet):
+        # Sheets are written atomically, so an existing file is a whole sheet.
+        return self.complete or self.sheet_path(sheet).exists()
+
+    def index_at(self, t):
+        """Thumbnail index covering time t (seconds)."""
+        return min(max(int(t // self.interval), 0), self.count - 1)
+
+    def time_of(self, index):
+        return index * self.interval
+
+    def tile(self, index):
+        """(sheet, (x1, y1, x2, y2)): where thumbnail index sits in its sprite sheet."""
+        sheet, i = divmod(index, self.per_sheet)
+        row, col = divmod(i, self.columns)
+        x, y = col * self.tile_width, row * self.tile_height
+        return sheet, (x, y, x + self.tile_width, y + self.tile_height)
+
+    def save(self):
+        """Writes the layout to meta.json, which marks directory as a finished strip."""
+        meta = {
+            "duration": self.duration,
+            "interval": self.interval,
+            "tile_width": self.tile_width,
+            "tile_height": self.tile_height,
+            "columns": self.columns,
+            "rows": self.rows,
+        }
+        tmp = self.directory / f"{_META}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.directory / _META)
+
+    @classmethod
+    def load(cls, directory):
+        with open(directory / _META, encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(directory, complete=True, **meta)
+
+def _strip_dir(video_file, interval):
+    return cache_dir("filmstrip") / signature_key(video_file) / f"{interval}s_{TILE_WIDTH}x{TILE_HEIGHT}"
+
+def filmstrip_key(video_file):
+    """core.engine job key of the filmstrip generation for video_file."""
+    return ("filmstrip", os.path.abspath(video_file))
+
+def _remove_stale(directory):
+    now = time.time()
+    for work in directory.parent.glob(f"{directory.name}.*.tmp"):
+        try:
+            if now - work.stat().st_mtime > _STALE_SECONDS:
+                shutil.rmtree(work, ignore_errors=True)
+        except OSError:
+            pass
+
+def _move_into_place(work, directory):
+    """Renames the finished strip in work to directory, unless another run got there first."""
+    if not (directory / _META).exists():
+        shutil.rmtree(directory, ignore_errors=True)  # Leftovers of an unfinished strip
+        try:
+            os.rename(work, directory)
+        except OSError:
+            pass
+    shutil.rmtree(work, ignore_errors=True)
+
+def generate_filmstrip(video_file, interval=DEFAULT_INTERVAL, on_sheet=None, on_start=None, key=None):
+    """
+    Builds the sprite sheets of video_file in a single ffmpeg pass that decodes only
+    keyframes: the fps filter keeps one frame per interval, scale/pad letterbox it and
+    tile packs the thumbnails into sheets. on_start(filmstrip) is called once the
+    layout is known and on_sheet(filmstrip, sheet) whenever a sheet has been written,
+    so a strip can fill in while the rest is generated. The sheets are written to a
+    work directory of this run and moved into the cache when complete, so runs for the
+    same video never touch each other's files. Runs as engine job key (default
+    filmstrip_key(video_file)); raises JobCancelled if that is cancelled.
+    """
+    directory = _strip_dir(video_file, interval)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    _remove_stale(directory)
+    work = Path(tempfile.mkdtemp(prefix=f"{directory.name}.", suffix=".tmp", dir=directory.parent))
+    try:
+        strip = Filmstrip(work, probe_duration(video_file), interval)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    if on_start is not None:
+        on_start(strip)
+    ready = set()
+
+    def _check_sheets(progress=None):
+        for sheet in range(strip.sheet_count):
+            if sheet not in ready and strip.sheet_path(sheet).exists():
+                ready.add(sheet)
+                if on_sheet is not None:
+                    on_sheet(strip, sheet)
+
+    vf = (
+        f"fps=1/{interval}:start_time=0,"
+        f"scale={TILE_WIDTH}:{TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={TILE_WIDTH}:{TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={SHEET_COLUMNS}x{SHEET_ROWS}"
+    )
+    cmd = [
+        "ffmpeg", "-y",
+        # Thumbnails come from keyframes only, which skips decoding everything else.
+        "-skip_frame", "nokey",
+        "-i", video_file,
+        "-an", "-sn",
+        "-vf", vf,
+        "-fps_mode", "vfr",
+        "-f", "image2",
+        "-atomic_writing", "1",
+        str(work / _SHEET_PATTERN)
+    ]
+    try:
+        with subprocess_engine.job(key or filmstrip_key(video_file)):
+            run_ffmpeg(cmd, duration=strip.duration, on_progress=_check_sheets, outputs=())
+        _check_sheets()
+        strip.save()
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    # Only a strip that is in place is complete: has_sheet then stops checking for the files.
+    _move_into_place(work, directory)
+    strip.directory = directory
+    strip.complete = True
+    with _lock:
+        _memory_cache[directory] = strip
+    return strip
+
+def get_filmstrip(video_file, interval=DEFAULT_INTERVAL, build=True, on_sheet=None, on_start=None, key=None):
+    """
+    Returns the complete Filmstrip of video_file from memory or the on-disk cache, else
+    generates it as engine job key (see generate_filmstrip) unless build is False. Entries are keyed by
+    path, size and mtime. Returns None when the video cannot be read.
+    """
+    try:
+        directory = _strip_dir(video_file, interval)
+    except OSError:
+        return None
+    with _lock:
+        strip = _memory_cache.get(directory)
+    if strip is None and (directory / _META).exists():
+        try:
+            strip = Filmstrip.load(directory)
+        except (OSError, ValueError, TypeError):
+            strip = None
+    if strip is not None:
+        with _lock:
+            _memory_cache[directory] = strip
+        if on_start is not None:
+            on_start(strip)
+        return strip
+    if not build:
+        return None
+    try:
+        return generate_filmstrip(video_file, interval, on_sheet, on_start, key)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
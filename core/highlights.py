@@ -0,0 +1,213 @@
+import os
+import subprocess
+import time
+from core.engine import subprocess_engine
+from core.event_bus import event_bus
+from core.ffmpeg import probe_duration
+from core.trimmer import seconds_to_time
+from core.waveform import BUCKET_SECONDS, SAMPLE_RATE, PcmBuckets, short_term_loudness
+
+# Scene scores are computed on a SCENE_SIZE copy of the video at SCENE_FPS frames per
+# second, which costs little next to decoding; a frame scoring above SCENE_THRESHOLD is a cut.
+SCENE_FPS = 5
+SCENE_SIZE = "160:90"
+SCENE_THRESHOLD = 0.3
+DEFAULT_TOP = 5
+CLIP_SECONDS = 30.0
+# Candidate windows start every WINDOW_STEP_SECONDS. A window scores its loudest moment
+# (robust z-score of the short-term loudness) plus SCENE_WEIGHT per cut, counting at most MAX_CUTS.
+WINDOW_STEP_SECONDS = 1.0
+SCENE_WEIGHT = 0.5
+MAX_CUTS = 6
+# The loudness spread never counts as less than this many dB, so that steady audio
+# does not turn small wobbles into peaks.
+MIN_SPREAD_DB = 1.0
+# Among equally good windows, the one whose loudest moment sits nearest PEAK_POSITION of
+# the way through wins (reactions follow what caused them); POSITION_PENALTY per window
+# length away from it breaks the tie without outweighing a cut.
+PEAK_POSITION = 2 / 3
+POSITION_PENALTY = 0.1
+
+class HighlightScan:
+    """
+    What one pass over a file found: the short-term loudness (dBFS) per bucket of
+    BUCKET_SECONDS and the times of the scene cuts. seconds is how long the scan took.
+    """
+
+    def __init__(self, loudness, cuts, duration, seconds):
+        self.loudness = loudness
+        self.cuts = cuts
+        self.duration = duration
+        self.seconds = seconds
+
+    @property
+    def x_realtime(self):
+        """Seconds of media scanned per second of wall time."""
+        return self.duration / self.seconds if self.seconds > 0 else None
+
+    def candidates(self, top=DEFAULT_TOP, clip_seconds=CLIP_SECONDS):
+        """
+        Up to top non-overlapping windows of clip_seconds, best first, as dicts with
+        start, end and peak (seconds), score and cuts. Windows where nothing stands
+        out (score 0) are never proposed.
+        """
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        count = len(self.loudness)
+        if not count:
+            return []
+        median = np.median(self.loudness)
+        spread = max(float(np.median(np.abs(self.loudness - median))) * 1.4826, MIN_SPREAD_DB)
+        excess = np.maximum((self.loudness - median) / spread, 0)
+
+        width = min(max(int(round(clip_seconds / BUCKET_SECONDS)), 1), count)
+        step = max(int(round(WINDOW_STEP_SECONDS / BUCKET_SECONDS)), 1)
+        starts = np.arange(0, count - width + 1, step)
+        peaks = sliding_window_view(excess, width)[::step].argmax(axis=1) + starts
+        cut_times = np.asarray(self.cuts, dtype=np.float64)
+        buckets = np.minimum((cut_times / BUCKET_SECONDS).astype(np.int64), count - 1)
+        cut_total = np.concatenate(([0], np.cumsum(np.bincount(buckets, minlength=count))))
+        cuts = cut_total[starts + width] - cut_total[starts]
+        scores = excess[peaks] + SCENE_WEIGHT * np.minimum(cuts, MAX_CUTS)
+        ranking = scores - POSITION_PENALTY * np.abs((peaks - starts) / width - PEAK_POSITION)
+
+        chosen = []
+        for i in np.argsort(-ranking, kind="stable"):
+            if len(chosen) >= top:
+                break
+            if scores[i] <= 0:
+                continue
+            start = round(float(starts[i]) * BUCKET_SECONDS, 3)
+            end = round(min(float(starts[i] + width) * BUCKET_SECONDS, max(self.duration, start)), 3)
+            # Greedy non-maximum suppression: a better window already covers this moment.
+            if any(start < c["end"] and c["start"] < end for c in chosen):
+                continue
+            chosen.append({
+                "start": start,
+                "end": end,
+                "peak": round(float(peaks[i]) * BUCKET_SECONDS, 3),
+                "score": round(float(scores[i]), 2),
+                "cuts": int(cuts[i]),
+            })
+        return chosen
+
+def highlight_key(video_file):
+    """core.engine job key of the highlight scan of video_file."""
+    return ("highlights", os.path.abspath(video_file))
+
+def _scan_command(video_file, audio_file=None):
+    cmd = ["ffmpeg", "-v", "error", "-i", video_file]
+    if audio_file:
+        cmd += ["-i", audio_file]
+    scene = (
+        f"[0:v:0]fps={SCENE_FPS},scale={SCENE_SIZE},select='gte(scene,0)',"
+        # Scores go to stderr ("pipe:2", escaped for the filter graph); stdout carries the audio.
+        "metadata=print:key=lavfi.scene_score:file=pipe\\\\:2[v]"
+    )
+    return cmd + [
+        "-filter_complex", scene,
+        "-map", "[v]", "-f", "null", "-",
+        "-map", f"{1 if audio_file else 0}:a:0",
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-f", "s16le",
+        "pipe:1"
+    ]
+
+def scan_highlights(video_file, audio_file=None, on_progress=None):
+    """
+    Scans video_file in a single streaming ffmpeg pass that scores scene changes and
+    decodes the audio (audio_file, if the streams were downloaded separately) to PCM,
+    summarised chunk by chunk with NumPy. on_progress(percent, x_realtime) is called as
+    the audio comes in. Runs as engine job highlight_key(video_file); raises JobCancelled
+    if that is cancelled and subprocess.CalledProcessError if ffmpeg fails (e.g. no audio).
+    """
+    try:
+        duration = probe_duration(audio_file or video_file)
+    except ValueError:
+        duration = None
+    buckets = PcmBuckets(int(SAMPLE_RATE * BUCKET_SECONDS))
+    cuts = []
+    frame_time = None
+    started = time.perf_counter()
+
+    def _on_data(data):
+        buckets.feed(data)
+        if on_progress is not None and duration:
+            scanned = buckets.samples / SAMPLE_RATE
+            on_progress(min(100.0, scanned / duration * 100), scanned / max(time.perf_counter() - started, 1e-6))
+
+    def _on_stderr(line):
+        # metadata=print writes "frame:N pts:P pts_time:T" followed by "lavfi.scene_score=S".
+        nonlocal frame_time
+        if line.startswith("frame:"):
+            _, _, value = line.rpartition("pts_time:")
+            try:
+                frame_time = float(value)
+            except ValueError:
+                frame_time = None
+            return True
+        if line.startswith("lavfi.scene_score="):
+            try:
+                score = float(line.partition("=")[2])
+            except ValueError:
+                return True
+            if score > SCENE_THRESHOLD and frame_time is not None:
+                cuts.append(frame_time)
+            return True
+        return False
+
+    cmd = _scan_command(video_file, audio_file)
+    with subprocess_engine.job(highlight_key(video_file)):
+        returncode, tail = subprocess_engine.run(cmd, on_data=_on_data, on_stderr=_on_stderr)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=tail)
+    _, _, rms = buckets.finish()
+    return HighlightScan(
+        short_term_loudness(rms),
+        cuts,
+        duration or buckets.samples / SAMPLE_RATE,
+        time.perf_counter() - started
+    )
+
+def highlight_tasks(video_file, candidates, audio_file=None):
+    """Trim tasks ({"video", "start", "end"}, plus "audio" if given) for the candidates."""
+    tasks = []
+    for candidate in candidates:
+        task = {"video": video_file, "start": seconds_to_time(candidate["start"]), "end": seconds_to_time(candidate["end"])}
+        if audio_file:
+            task["audio"] = audio_file
+        tasks.append(task)
+    return tasks
+
+def propose_highlights(video_file, audio_file=None, top=DEFAULT_TOP, clip_seconds=CLIP_SECONDS):
+    """
+    Scans video_file (see scan_highlights) and returns trim tasks for its top highlight
+    candidates, best first, for the caller to queue. Publishes 'highlight_scan_progress'
+    with the percentage done and the throughput so far, then 'highlight_scan_complete'
+    with the duration, scan time, throughput (x realtime) and the candidates.
+    """
+    reported = -1
+
+    def _on_progress(percent, x_realtime):
+        nonlocal reported
+        if int(percent) > reported:
+            reported = int(percent)
+            event_bus.publish("highlight_scan_progress", {
+                "video": video_file,
+                "percent": percent,
+                "x_realtime": round(x_realtime, 1),
+            })
+
+    scan = scan_highlights(video_file, audio_file, _on_progress)
+    candidates = scan.candidates(top, clip_seconds)
+    event_bus.publish("highlight_scan_complete", {
+        "video": video_file,
+        "duration": scan.duration,
+        "seconds": round(scan.seconds, 2),
+        "x_realtime": round(scan.x_realtime, 1) if scan.x_realtime else None,
+        "cuts": len(scan.cuts),
+        "candidates": candidates,
+    })
+    return highlight_tasks(video_file, candidates, audio_file)
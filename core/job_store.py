@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+import time
+from core.paths import project_dir
+
+JOB_STATES = ("pending", "running", "done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trim_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    position INTEGER NOT NULL,
+    video TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    audio TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    output TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS trim_jobs_state ON trim_jobs (state, position);
+"""
+
+def default_store_path():
+    return project_dir() / "trim_queue.sqlite3"
+
+class JobStore:
+    """
+    Durable trim queue. Every task is a row holding its range and state
+    (pending, running, done, failed or cancelled), so a crashed or closed queue
+    can be resumed without redoing finished work. Safe to share between threads.
+    Use path=":memory:" for a throwaway queue.
+    """
+
+    def __init__(self, path=None):
+        self.path = str(path or default_store_path())
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(trim_jobs)")}
+        if "audio" not in columns:
+            # Queues created before separate audio streams were supported.
+            self._conn.execute("ALTER TABLE trim_jobs ADD COLUMN audio TEXT")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def add(self, task):
+        """
+        Appends a {"video", "start", "end"} task and returns its job id. An optional
+        "audio" file is cut alongside the video when the streams were downloaded separately.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO trim_jobs (position, video, start, end, audio, updated) "
+                "VALUES ((SELECT COALESCE(MAX(position), 0) + 1 FROM trim_jobs), ?, ?, ?, ?, ?)",
+                (task["video"], task["start"], task["end"], task.get("audio"), time.time())
+            )
+            return cur.lastrowid
+
+    def add_many(self, tasks):
+        return [self.add(task) for task in tasks]
+
+    def add_missing(self, tasks):
+        """Adds the tasks not already in the store (same video, range and audio) and returns their ids."""
+        stored = {(job["video"], job["start"], job["end"], job["audio"]) for job in self.jobs()}
+        return self.add_many([
+            task for task in tasks
+            if (task["video"], task["start"], task["end"], task.get("audio")) not in stored
+        ])
+
+    def get(self, job_id):
+        rows = self._query("SELECT * FROM trim_jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def jobs(self, states=None):
+        """Jobs in queue order, optionally limited to the given states."""
+        if states:
+            marks = ",".join("?" * len(states))
+            return self._query(f"SELECT * FROM trim_jobs WHERE state IN ({marks}) ORDER BY position", tuple(states))
+        return self._query("SELECT * FROM trim_jobs ORDER BY position")
+
+    def unfinished(self):
+        """Jobs a (re)started queue has to run: everything that is not done or cancelled."""
+        return self.jobs(("pending", "running", "failed"))
+
+    def counts(self):
+        rows = self._query("SELECT state, COUNT(*) AS n FROM trim_jobs GROUP BY state")
+        return {row["state"]: row["n"] for row in rows}
+
+    def remove(self, job_id):
+        self._execute("DELETE FROM trim_jobs WHERE id = ?", (job_id,))
+
+    def clear(self, states=("done",)):
+        marks = ",".join("?" * len(states))
+        self._execute(f"DELETE FROM trim_jobs WHERE state IN ({marks})", tuple(states))
+
+    def swap(self, job_a, job_b):
+        """Exchanges the queue positions of two jobs."""
+        with self._lock:
+            rows = {
+                row["id"]: row["position"]
+                for row in self._conn.execute("SELECT id, position FROM trim_jobs WHERE id IN (?, ?)", (job_a, job_b))
+            }
+            if len(rows) != 2:
+                return
+            self._conn.execute("BEGIN")
+            self._conn.execute("UPDATE trim_jobs SET position = ? WHERE id = ?", (rows[job_b], job_a))
+            self._conn.execute("UPDATE trim_jobs SET position = ? WHERE id = ?", (rows[job_a], job_b))
+            self._conn.execute("COMMIT")
+
+    def retarget(self, job_id, video, start, end, audio=None):
+        """Points a job at another source and range, e.g. a downloaded piece of the original URL."""
+        self._execute(
+            "UPDATE trim_jobs SET video = ?, start = ?, end = ?, audio = ?, updated = ? WHERE id = ?",
+            (video, start, end, audio, time.time(), job_id)
+        )
+
+    def mark(self, job_id, state, output=None, error=None):
+        if state not in JOB_STATES:
+            raise ValueError(f"Unknown job state: {state}")
+        self._execute(
+            "UPDATE trim_jobs SET state = ?, output = COALESCE(?, output), error = ?, updated = ? WHERE id = ?",
+            (state, output, error, time.time(), job_id)
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
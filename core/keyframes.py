@@ -0,0 +1,142 @@
+import bisect
+import os
+import struct
+import subprocess
+import threading
+from array import array
+from core.paths import cache_dir, signature_key
+
+# Sidecar layout: magic, version, keyframe count, duration, then the keyframe
+# presentation times followed by their decode times, both as doubles.
+_MAGIC = b"CFKI"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIQd")
+
+_memory_cache = {}
+_lock = threading.Lock()
+
+class KeyframeIndex:
+    """Sorted keyframe timestamps (seconds) of a video's first video stream."""
+
+    def __init__(self, times, dts=None, duration=0.0):
+        self.times = times
+        self.dts = dts if dts is not None else array("d", times)
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.times)
+
+    def before(self, t):
+        """Latest keyframe at or before t (the first keyframe if t precedes them all)."""
+        if not self.times:
+            return None
+        i = bisect.bisect_right(self.times, t + 1e-6)
+        return self.times[max(i - 1, 0)]
+
+    def after(self, t):
+        """Earliest keyframe at or after t, or None past the last keyframe."""
+        i = bisect.bisect_left(self.times, t - 1e-6)
+        return self.times[i] if i < len(self.times) else None
+
+    def decode_time(self, keyframe):
+        """
+        Decode timestamp of a keyframe returned by before()/after(). With B-frames it is
+        earlier than the presentation time, and it is what stream-copy seeking compares against.
+        """
+        i = bisect.bisect_left(self.times, keyframe - 1e-6)
+        return self.dts[i] if i < len(self.dts) else keyframe
+
+    def nearest(self, t):
+        candidates = [k for k in (self.before(t), self.after(t)) if k is not None]
+        return min(candidates, key=lambda k: abs(k - t)) if candidates else None
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(self.times), self.duration))
+            self.times.tofile(f)
+            self.dts.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, version, count, duration = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Not a keyframe index: {path}")
+            times = array("d")
+            times.fromfile(f, count)
+            dts = array("d")
+            dts.fromfile(f, count)
+        return cls(times, dts, duration)
+
+def scan_keyframes(video_file):
+    """Builds a KeyframeIndex with a single ffprobe packet scan (no decoding)."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,flags",
+        "-of", "csv=print_section=0",
+        video_file
+    ]
+    keyframes = []
+    duration = 0.0
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in proc.stdout:
+        fields = line.strip().split(",")
+        if len(fields) < 3:
+            continue
+        try:
+            pts = float(fields[0])
+        except ValueError:
+            continue  # N/A timestamps
+        try:
+            dts = float(fields[1])
+        except ValueError:
+            dts = pts
+        duration = max(duration, pts)
+        if "K" in fields[2]:
+            keyframes.append((pts, dts))
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    # Packets come in decode order; B-frame reordering can leave keyframes slightly out of order.
+    keyframes.sort()
+    return KeyframeIndex(
+        array("d", (pts for pts, _ in keyframes)),
+        array("d", (dts for _, dts in keyframes)),
+        duration
+    )
+
+def _sidecar_path(video_file):
+    return cache_dir("keyframes") / f"{signature_key(video_file)}.kfi"
+
+def get_keyframe_index(video_file, build=True):
+    """
+    Returns the KeyframeIndex of video_file, from memory or the on-disk cache when possible.
+    With build=False no ffprobe scan is started and None is returned on a cache miss.
+    Entries are keyed by path, size and mtime, so edited files are rescanned.
+    """
+    try:
+        sidecar = _sidecar_path(video_file)
+    except OSError:
+        return None
+    with _lock:
+        index = _memory_cache.get(sidecar)
+    if index is not None:
+        return index
+    if sidecar.exists():
+        try:
+            index = KeyframeIndex.load(sidecar)
+        except (OSError, ValueError, EOFError, struct.error):
+            index = None
+    if index is None:
+        if not build:
+            return None
+        try:
+            index = scan_keyframes(video_file)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        index.save(sidecar)
+    with _lock:
+        _memory_cache[sidecar] = index
+    return index
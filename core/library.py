@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+import time
+from core.metadata_cache import video_key
+from core.paths import partial_hash, project_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    video_key TEXT NOT NULL,
+    format_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    url TEXT,
+    title TEXT,
+    format TEXT,
+    ext TEXT,
+    width INTEGER,
+    height INTEGER,
+    vcodec TEXT,
+    acodec TEXT,
+    requested TEXT,
+    duration REAL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (video_key, format_id)
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS media_height ON media (video_key, height);
+"""
+
+# Columns added after the first release, created on older libraries when opened.
+_ADDED_COLUMNS = ("vcodec TEXT", "acodec TEXT", "requested TEXT")
+
+def default_library_path():
+    return project_dir() / "library.sqlite3"
+
+def info_key(info):
+    """video_key of a yt-dlp info dict (or a flat playlist entry), None if it has no id."""
+    video_id = info.get("id")
+    if not video_id:
+        return None
+    extractor = info.get("extractor_key") or info.get("ie_key") or info.get("extractor") or "generic"
+    return video_key(extractor, video_id)
+
+def _has_video(row):
+    if row["vcodec"] is None:
+        return row["height"] is not None  # Recorded before codecs were
+    return row["vcodec"] != "none"
+
+def _has_audio(row):
+    return row["acodec"] != "none"  # Unknown (None) counts as present
+
+def _requested_height(requested):
+    """Height cap of a requested resolution such as '720p'; None for 'best'."""
+    return None if requested == "best" else int(requested[:-1])
+
+def _satisfies(row, max_height):
+    """
+    True if row is what a download capped at max_height (None: best) would fetch:
+    exactly that height, or the best that was available under a cap at least as high.
+    """
+    height = row["height"]
+    if max_height is not None and height == max_height:
+        return True
+    try:
+        cap = _requested_height(row["requested"])
+    except (TypeError, ValueError):
+        return False  # Recorded before requests were, or unparsable
+    if max_height is None:
+        return cap is None
+    return (cap is None or cap >= max_height) and height is not None and height <= max_height
+
+class MediaLibrary:
+    """
+    Catalogue of downloaded media keyed by extractor + video id and the downloaded
+    format, recording where each file is and what it holds (format, resolution,
+    duration, size and core.paths.partial_hash). Entries whose file has gone or
+    changed size are dropped when looked up. Safe to share between threads.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            path = str(self._path or default_library_path())
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(media)")}
+            for column in _ADDED_COLUMNS:
+                if column.split()[0] not in columns:
+                    self._conn.execute(f"ALTER TABLE media ADD COLUMN {column}")
+            self._conn.executescript(_INDEXES)
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def _live(self, rows):
+        """Rows whose file is still on disk with the recorded size; stale rows are removed."""
+        live = []
+        for row in rows:
+            try:
+                if os.path.getsize(row["path"]) == row["size"]:
+                    live.append(row)
+                    continue
+            except OSError:
+                pass
+            self.remove(row["video_key"], row["format_id"])
+        return live
+
+    def get(self, key, format_id):
+        """The entry for a video key and exact format id (e.g. "137+140"), or None."""
+        rows = self._live(self._query("SELECT * FROM media WHERE video_key = ? AND format_id = ?", (key, format_id)))
+        return rows[0] if rows else None
+
+    def find(self, key, max_height=None):
+        """
+        The video entry a download of the video capped at max_height (None: best) would
+        produce, or None. A lower-resolution copy from a lower cap does not count, nor
+        does an audio-only entry; a video-only entry needs its separate audio too.
+        """
+        rows = self._live(self._query("SELECT * FROM media WHERE video_key = ? ORDER BY height DESC", (key,)))
+        audio = any(_has_audio(row) and not _has_video(row) for row in rows)
+        for row in rows:
+            if _has_video(row) and (audio or _has_audio(row)) and _satisfies(row, max_height):
+                return row
+        return None
+
+    def add(self, info, path, url=None, resolution=None):
+        """
+        Records the file a processed info dict (as returned by process_ie_result) was
+        downloaded to, and the resolution choice ('720p', 'best') it was downloaded for.
+        """
+        key = info_key(info)
+        if key is None:
+            return None
+        path = os.path.abspath(path)
+        entry = {
+            "video_key": key,
+            "format_id": info.get("format_id") or "unknown",
+            "path": path,
+            "url": url or info.get("webpage_url"),
+            "title": info.get("title"),
+            "format": info.get("format"),
+            "ext": info.get("ext"),
+            "width": info.get("width"),
+            "height": info.get("height"),
+            "vcodec": info.get("vcodec"),
+            "acodec": info.get("acodec"),
+            "requested": resolution,
+            "duration": info.get("duration"),
+            "size": os.path.getsize(path),
+            "hash": partial_hash(path),
+            "added": time.time(),
+        }
+        columns = ", ".join(entry)
+        marks = ", ".join("?" * len(entry))
+        with self._lock:
+            self._connection().execute(f"INSERT OR REPLACE INTO media ({columns}) VALUES ({marks})", tuple(entry.values()))
+        return entry
+
+    def remove(self, key, format_id):
+        with self._lock:
+            self._connection().execute("DELETE FROM media WHERE video_key = ? AND format_id = ?", (key, format_id))
+
+    def entries(self):
+        return self._query("SELECT * FROM media ORDER BY added")
+
+    def count(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+# Global media library instance
+media_library = MediaLibrary()
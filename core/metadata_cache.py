@@ -0,0 +1,84 @@
+import json
+import sqlite3
+import threading
+import time
+from core.paths import cache_dir
+
+# Format URLs inside an info dict expire after a few hours on most sites.
+DEFAULT_TTL = 3 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_info (
+    video_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS video_info_url ON video_info (url);
+"""
+
+def video_key(extractor, video_id):
+    """Cache key of a video: extractor name (case-insensitive) plus the extractor's video id (case-sensitive)."""
+    return f"{str(extractor).lower()}:{video_id}"
+
+class MetadataCache:
+    """
+    Persistent cache of yt-dlp info dicts keyed by extractor + video id, also
+    findable by the URL they were extracted from. Entries older than ttl seconds
+    are treated as missing. clock can be replaced in tests.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, clock=time.time):
+        self._path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            path = str(self._path or cache_dir("metadata") / "info.sqlite3")
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _lookup(self, column, value):
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT fetched, info FROM video_info WHERE {column} = ? ORDER BY fetched DESC LIMIT 1",
+                (value,)
+            ).fetchone()
+        if row is None or self.clock() - row[0] > self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def get(self, url):
+        """Fresh info dict previously extracted from url, or None."""
+        return self._lookup("url", url)
+
+    def get_by_id(self, extractor, video_id):
+        """Fresh info dict for a known extractor + video id, or None."""
+        return self._lookup("video_key", video_key(extractor, video_id))
+
+    def put(self, url, info):
+        """Stores a JSON-serialisable single-video info dict."""
+        extractor = info.get("extractor_key") or info.get("extractor") or "generic"
+        key = video_key(extractor, info.get("id") or url)
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO video_info (video_key, url, fetched, info) VALUES (?, ?, ?, ?)",
+                (key, url, self.clock(), json.dumps(info))
+            )
+
+    def invalidate(self, url):
+        with self._lock:
+            self._connection().execute("DELETE FROM video_info WHERE url = ?", (url,))
+
+    def purge_expired(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM video_info WHERE fetched < ?", (self.clock() - self.ttl,))
+
+# Global metadata cache instance
+metadata_cache = MetadataCache()
@@ -0,0 +1,39 @@
+import hashlib
+import os
+from pathlib import Path
+
+def project_dir(*parts):
+    """Returns (and creates) a directory below the project's videos/ folder."""
+    path = Path().resolve().joinpath("videos", *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def cache_dir(name):
+    """Returns (and creates) the on-disk cache directory for one kind of cached data."""
+    return project_dir(".cache", name)
+
+def file_signature(path):
+    """Identity of a file on disk: absolute path, size and modification time."""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+def signature_key(path):
+    """Stable hex key for cache entries that must be invalidated when the file changes."""
+    abs_path, size, mtime_ns = file_signature(path)
+    return hashlib.sha1(f"{abs_path}|{size}|{mtime_ns}".encode("utf-8")).hexdigest()
+
+_PARTIAL_HASH_CHUNK = 1024 * 1024
+
+def partial_hash(path):
+    """
+    Fast content fingerprint: sha1 over the size plus the first and last MiB of the file.
+    Survives renames and moves, unlike file_signature.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(_PARTIAL_HASH_CHUNK))
+        if size > 2 * _PARTIAL_HASH_CHUNK:
+            f.seek(-_PARTIAL_HASH_CHUNK, os.SEEK_END)
+            digest.update(f.read(_PARTIAL_HASH_CHUNK))
+    return digest.hexdigest()
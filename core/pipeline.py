@@ -0,0 +1,144 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.clip_cache import clip_cache
+from core.downloader import DEFAULT_RANGE_MARGIN, DownloadManager, range_task
+from core.event_bus import event_bus
+from core.job_store import JobStore
+from core.trimmer import TRIM_MODES, default_trim_workers, run_trim_group, trim_groups
+
+class PipelineJob:
+    """
+    A URL plus the trim ranges to cut from it. It moves through a small DAG: one download
+    node, then trim nodes (one per ffmpeg pass, see core.trimmer.trim_groups) that all
+    depend on it. state is queued, downloading, trimming, complete or failed.
+    """
+    def __init__(self, job_id, url, trim_ids):
+        self.id = job_id
+        self.url = url
+        self.trim_ids = trim_ids
+        self.state = "queued"
+        self.download = None
+        self.error = None
+        self._trims_left = 0
+        self._reported = False
+
+    @property
+    def finished(self):
+        return self.state in ("complete", "failed")
+
+    def event_data(self, **extra):
+        return {"pipeline_job": self.id, "url": self.url, **extra}
+
+class Pipeline:
+    """
+    Download→trim pipeline. Downloads run on a DownloadManager and trims on their own
+    pool, each stage with its own number of slots, so a file's trims start as soon as
+    it is downloaded while other downloads are still running.
+    With ranges_only, only the parts around the ranges are fetched (see
+    DownloadManager.submit_ranges) instead of whole files.
+    Publishes pipeline_job_trimming, pipeline_job_complete, pipeline_job_failed and,
+    when every job has finished, pipeline_complete; the stages publish their usual
+    download_* and trim_task_* events.
+    """
+
+    def __init__(self, download_slots=None, trim_slots=None, mode="copy", resolution="best",
+                 ranges_only=False, margin=DEFAULT_RANGE_MARGIN, store=None, cache=clip_cache, manager=None):
+        if mode not in TRIM_MODES:
+            raise ValueError(f"Unknown trim mode: {mode}")
+        self.manager = manager or DownloadManager()
+        if download_slots is not None:
+            self.manager.set_max_concurrent(download_slots)
+        self.trim_slots = max(1, int(trim_slots or default_trim_workers()))
+        self.mode = mode
+        self.resolution = resolution
+        self.ranges_only = ranges_only
+        self.margin = margin
+        self.store = store or JobStore(":memory:")
+        self.cache = cache
+        self._trim_pool = ThreadPoolExecutor(max_workers=self.trim_slots, thread_name_prefix="pipeline-trim")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+
+    def submit(self, url, ranges):
+        """Queues url with a list of (start, end) ranges (seconds or "HH:MM:SS") and returns its PipelineJob."""
+        trim_ids = self.store.add_many([range_task(url, start, end) for start, end in ranges])
+        job = PipelineJob(next(self._ids), url, trim_ids)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.state = "downloading"
+        on_done = lambda download: self._downloaded(job, download)
+        if self.ranges_only:
+            job.download = self.manager.submit_ranges(
+                url, store=self.store, resolution=self.resolution, margin=self.margin,
+                trim_mode=self.mode, job_ids=trim_ids, trim=False, on_done=on_done
+            )
+        else:
+            job.download = self.manager.submit(url, self.resolution, on_done=on_done)
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def wait(self, timeout=None):
+        """Blocks until every job has finished and its events are out. Returns False on timeout."""
+        with self._done:
+            return self._done.wait_for(lambda: all(job._reported for job in self._jobs.values()), timeout)
+
+    def shutdown(self):
+        self._trim_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _downloaded(self, job, download):
+        # Runs on the download worker: schedule the trim nodes and return.
+        if download.state != "complete":
+            error = f"Download {download.state}: {download.error}" if download.error else f"Download {download.state}"
+            for trim_id in job.trim_ids:
+                self.store.mark(trim_id, "failed", error=error)
+            self._finish(job, "failed", error)
+            return
+        if not self.ranges_only:
+            for trim_id in job.trim_ids:
+                task = self.store.get(trim_id)
+                self.store.retarget(trim_id, download.filename, task["start"], task["end"], download.audio_filename)
+        groups = trim_groups([self.store.get(trim_id) for trim_id in job.trim_ids], self.mode)
+        with self._lock:
+            job.state = "trimming"
+            job._trims_left = len(groups)
+        event_bus.publish("pipeline_job_trimming", job.event_data(trims=len(job.trim_ids)))
+        if not groups:
+            self._finish(job, "complete")
+            return
+        for group in groups:
+            future = self._trim_pool.submit(run_trim_group, self.store, group, self.mode, self.cache)
+            future.add_done_callback(lambda _future: self._trimmed(job))
+
+    def _trimmed(self, job):
+        with self._lock:
+            job._trims_left -= 1
+            if job._trims_left:
+                return
+        tasks = [self.store.get(trim_id) for trim_id in job.trim_ids]
+        failed = [task for task in tasks if task["state"] != "done"]
+        if failed:
+            self._finish(job, "failed", f"{len(failed)} of {len(tasks)} trims failed")
+        else:
+            self._finish(job, "complete")
+
+    def _finish(self, job, state, error=None):
+        outputs = [task["output"] for task in map(self.store.get, job.trim_ids) if task["state"] == "done"]
+        with self._lock:
+            job.state = state
+            job.error = error
+            idle = all(other.finished for other in self._jobs.values())
+        if state == "complete":
+            event_bus.publish("pipeline_job_complete", job.event_data(outputs=outputs))
+        else:
+            event_bus.publish("pipeline_job_failed", job.event_data(outputs=outputs, error=error))
+        if idle:
+            event_bus.publish("pipeline_complete", None)
+        with self._done:
+            job._reported = True
+            self._done.notify_all()
@@ -1,15 +1,52 @@
 import os
+import shutil
 import subprocess
+import tempfile
 import threading
-from pathlib import Path
-from core.event_bus import event_bus
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.event_bus import event_bus, Throttle
+from core.ffmpeg import run_ffmpeg
+from core.clip_cache import clip_cache
+from core.engine import JobCancelled, subprocess_engine
+from core.job_store import JobStore
+from core.keyframes import get_keyframe_index
+from core.paths import partial_hash, project_dir
+
+# Upper bound on the number of outputs written by a single ffmpeg pass.
+MAX_OUTPUTS_PER_PASS = 32
+# Minimum seconds between two trim_task_progress events of one ffmpeg run.
+PROGRESS_INTERVAL = 0.5
+
+# copy:     stream copy, fast but starts on the keyframe before the requested start.
+# smart:    re-encode only up to the first keyframe inside the clip, stream copy the rest.
+# reencode: re-encode the whole clip, frame accurate but slow.
+TRIM_MODES = ("copy", "smart", "reencode")
+
+# Encoder used to re-encode a source video stream, by ffprobe codec name.
+_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "vp9": "libvpx-vp9",
+    "vp8": "libvpx",
+    "av1": "libaom-av1",
+    "mpeg4": "mpeg4",
+}
+# Codecs whose re-encoded head can be joined to stream-copied frames (via MPEG-TS intermediates).
+_SMART_CODECS = ("h264", "hevc")
+
+def default_trim_workers():
+    """Number of ffmpeg processes to run at once when no limit is given."""
+    return os.cpu_count() or 1
 
 def time_to_seconds(t_str):
     parts = t_str.split(":")
     try:
-        parts = [int(p) for p in parts]
+        parts = [int(p) for p in parts[:-1]] + [float(parts[-1])]
     except ValueError:
         return None
+    if parts[-1].is_integer():
+        parts[-1] = int(parts[-1])
     if len(parts) == 3:
         return parts[0]*3600 + parts[1]*60 + parts[2]
     elif len(parts) == 2:
@@ -18,42 +55,521 @@ def time_to_seconds(t_str):
         return parts[0]
     return None
 
-def process_trim_tasks(tasks):
-    def _process():
-        root_dir = Path().resolve()  # Get the root directory of the project
-        output_dir = root_dir / "videos" / "trimmed"
-        output_dir.mkdir(parents=True, exist_ok=True)  # Ensure the output directory exists
-
-        for idx, task in enumerate(tasks):
-            video_file = task["video"]
-            start = task["start"]
-            end = task["end"]
-
-            start_sec = time_to_seconds(start)
-            end_sec = time_to_seconds(end)
-            if start_sec is None or end_sec is None or end_sec <= start_sec:
-                event_bus.publish("trim_task_failed", f"Task {idx+1}: Invalid time range (start: {start}, end: {end}). Skipping.")
-                continue
-
-            duration = end_sec - start_sec
-            base, ext = os.path.splitext(os.path.basename(video_file))
-            output_file = output_dir / f"{base}_trim_{idx+1}{ext}"
-
-            cmd = [
-                "ffmpeg", "-y",
-                "-ss", start,
-                "-i", video_file,
-                "-t", str(duration),
-                "-c", "copy",
-                "-avoid_negative_ts", "make_zero",
-                str(output_file)
-            ]
-            event_bus.publish("trim_task_started", f"Processing task {idx+1}: {os.path.basename(video_file)} {start} to {end} -> {output_file}")
+def seconds_to_time(seconds):
+    """Formats seconds as HH:MM:SS.mmm."""
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}.{ms:03}"
+
+def keyframe_drift(video_file, start_sec, build=True):
+    """
+    Returns (keyframe, drift) for a stream-copy cut at start_sec: the keyframe the
+    clip will actually start on and how many seconds early that is, or None if the
+    keyframe index is unavailable.
+    """
+    index = get_keyframe_index(video_file, build=build)
+    if index is None:
+        return None
+    keyframe = index.before(start_sec)
+    if keyframe is None:
+        return None
+    return keyframe, max(start_sec - keyframe, 0.0)
+
+def _progress_reporter(store, windows):
+    """
+    Builds an on_progress callback for run_ffmpeg that publishes rate-limited
+    'trim_task_progress' events. windows is a list of (job_id, offset, duration):
+    the part of the run's output timeline each job covers.
+    """
+    throttle = Throttle(PROGRESS_INTERVAL)
+
+    def _on_progress(progress):
+        if not throttle.ready(force=progress["done"]):
+            return
+        for job_id, offset, duration in windows:
+            out_time = progress["out_time"]
+            if progress["done"]:
+                out_time = duration
+            elif out_time is not None:
+                out_time = min(max(out_time - offset, 0.0), duration)
+            percent = None
+            if out_time is not None and duration > 0:
+                percent = out_time / duration * 100
+            event_bus.publish("trim_task_progress", {
+                "store": store.path,
+                "task": job_id,
+                "out_time": out_time,
+                "fps": progress["fps"],
+                "speed": progress["speed"],
+                "percent": percent,
+            })
+    return _on_progress
+
+def _run(cmd, progress=None, outputs=None):
+    run_ffmpeg(cmd, on_progress=progress, outputs=outputs)
+
+def trim_key(store, job_id):
+    """core.engine job key of a trim job; ids restart in every in-memory store, so the store is part of it."""
+    return ("trim", id(store), job_id)
+
+def _probe_video_stream(video_file):
+    """Returns (codec_name, pix_fmt) of the first video stream, or (None, None)."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,pix_fmt",
+        "-of", "csv=print_section=0",
+        video_file
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    fields = result.stdout.strip().split(",")
+    if len(fields) < 2:
+        return None, None
+    return fields[0], fields[1]
+
+def _encode_args(codec, pix_fmt):
+    encoder = _ENCODERS.get(codec, "libx264")
+    args = ["-c:v", encoder]
+    if pix_fmt:
+        args += ["-pix_fmt", pix_fmt]
+    if encoder in ("libx264", "libx265"):
+        args += ["-preset", "veryfast", "-crf", "18"]
+    return args
+
+def _audio_input(audio_file, start):
+    """
+    Input arguments for an audio stream downloaded separately from the video, seeked
+    to the same point so both inputs share a timeline, plus the maps that take the
+    video from input 0 and the audio from it. Nothing for a muxed source.
+    """
+    if not audio_file:
+        return [], []
+    return ["-ss", str(start), "-i", audio_file], ["-map", "0:v:0", "-map", "1:a:0"]
+
+def _cut_copy(video_file, start, duration, output_file, progress=None, audio_file=None):
+    audio_input, maps = _audio_input(audio_file, start)
+    _run([
+        "ffmpeg", "-y",
+        "-ss", str(start),
+        "-i", video_file,
+        *audio_input,
+        "-t", str(duration),
+        *maps,
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        str(output_file)
+    ], progress)
+
+def _cut_reencode(video_file, start_sec, duration, output_file, stream=None, progress=None, audio_file=None):
+    codec, pix_fmt = stream or _probe_video_stream(video_file)
+    audio_input, maps = _audio_input(audio_file, f"{start_sec:.6f}")
+    _run([
+        "ffmpeg", "-y",
+        "-ss", f"{start_sec:.6f}",
+        "-i", video_file,
+        *audio_input,
+        # Output-side -ss 0 drops the copied audio packets that precede the input seek point.
+        "-ss", "0",
+        "-t", f"{duration:.6f}",
+        *maps,
+        *_encode_args(codec, pix_fmt),
+        "-c:a", "copy",
+        "-avoid_negative_ts", "make_zero",
+        str(output_file)
+    ], progress)
+
+def _cut_smart(video_file, start_sec, end_sec, output_file, progress=None, audio_file=None):
+    """
+    Frame-accurate cut at close to stream-copy speed: the video from start_sec up to the
+    first keyframe inside the clip is re-encoded, the rest is stream copied, and the two
+    parts are joined with the concat demuxer. Audio is stream copied for the whole range,
+    from audio_file when the streams were downloaded separately.
+    Returns a short description of what was done, for the log.
+    """
+    index = get_keyframe_index(video_file)
+    stream = _probe_video_stream(video_file)
+    if index is None or stream[0] not in _SMART_CODECS:
+        _cut_reencode(video_file, start_sec, end_sec - start_sec, output_file, stream, progress, audio_file)
+        return "full re-encode, smart render unavailable for this source"
+
+    keyframe = index.after(start_sec)
+    if keyframe is None or keyframe >= end_sec:
+        _cut_reencode(video_file, start_sec, end_sec - start_sec, output_file, stream, progress, audio_file)
+        return "full re-encode, clip lies within one GOP"
+    if keyframe - start_sec < 0.001:
+        _cut_copy(video_file, f"{start_sec:.6f}", end_sec - start_sec, output_file, progress, audio_file)
+        return "stream copy, start is on a keyframe"
+
+    work_dir = tempfile.mkdtemp(prefix=".smart_", dir=os.path.dirname(os.fspath(output_file)))
+    try:
+        head = os.path.join(work_dir, "head.ts")
+        tail = os.path.join(work_dir, "tail.ts")
+        concat_list = os.path.join(work_dir, "parts.txt")
+        _run([
+            "ffmpeg", "-y",
+            "-ss", f"{start_sec:.6f}",
+            "-i", video_file,
+            "-t", f"{keyframe - start_sec:.6f}",
+            "-map", "0:v:0",
+            *_encode_args(*stream),
+            # Without B-frames the head's timestamps start at zero and survive the final -ss 0.
+            "-bf", "0",
+            "-f", "mpegts", head
+        ])
+        # Input seeking in copy mode lands on the keyframe itself.
+        _run([
+            "ffmpeg", "-y",
+            "-ss", f"{keyframe:.6f}",
+            "-i", video_file,
+            "-t", f"{end_sec - keyframe:.6f}",
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-f", "mpegts", tail
+        ])
+        with open(concat_list, "w", encoding="utf-8") as f:
+            f.write(f"file '{head}'\nfile '{tail}'\n")
+        _run([
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-ss", f"{start_sec:.6f}",
+            "-i", audio_file or video_file,
+            "-ss", "0",
+            "-t", f"{end_sec - start_sec:.6f}",
+            "-map", "0:v:0",
+            "-map", "1:a?",
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            str(output_file)
+        ], progress)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return f"smart render, re-encoded {keyframe - start_sec:.2f}s up to keyframe"
+
+def _output_file(job, output_dir):
+    # Named after the job id, so the result does not depend on completion order.
+    base, ext = os.path.splitext(os.path.basename(job["video"]))
+    audio = job.get("audio")
+    if audio and ext.lower() == ".webm" and os.path.splitext(audio)[1].lower() not in (".webm", ".opus", ".ogg"):
+        ext = ".mkv"  # WebM cannot hold the separate audio stream (e.g. AAC)
+    return output_dir / f"{base}_trim_{job['id']}{ext}"
+
+def _partial_file(output_file):
+    """Where ffmpeg writes before the finished clip is renamed into place."""
+    return output_file.with_name(f"{output_file.stem}.part{output_file.suffix}")
+
+def _validate(store, job):
+    """Returns (start_sec, end_sec) or marks the job failed and returns None."""
+    start_sec = time_to_seconds(job["start"])
+    end_sec = time_to_seconds(job["end"])
+    if start_sec is None or end_sec is None or end_sec <= start_sec:
+        _fail(store, job, f"Task {job['id']}: Invalid time range (start: {job['start']}, end: {job['end']}). Skipping.")
+        return None
+    return start_sec, end_sec
+
+def _publish(store, event_name, job, message):
+    """Publishes a trim_task_* event; store is the queue's path, so a listener can tell its own queue's jobs apart."""
+    event_bus.publish(event_name, {"store": store.path, "task": job["id"], "message": message})
+
+def _publish_started(store, job, output_file, drift=None):
+    store.mark(job["id"], "running")
+    message = f"Processing task {job['id']}: {os.path.basename(job['video'])} {job['start']} to {job['end']} -> {output_file}"
+    if drift:
+        message += f" (starts {drift:.2f}s early at keyframe)"
+    _publish(store, "trim_task_started", job, message)
+
+def _complete(store, job, output_file, note=None, cache=None, cache_key=None):
+    """Atomically moves the partial output into place, caches it and marks the job done."""
+    os.replace(_partial_file(output_file), output_file)
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, output_file)
+    store.mark(job["id"], "done", output=str(output_file))
+    message = f"Saved: {output_file}"
+    if note:
+        message += f" ({note})"
+    _publish(store, "trim_task_complete", job, message)
+
+def _fail(store, job, message, output_file=None):
+    if output_file is not None:
+        try:
+            os.remove(_partial_file(output_file))
+        except OSError:
+            pass
+    store.mark(job["id"], "failed", error=message)
+    _publish(store, "trim_task_failed", job, message)
+
+def _cancel(store, job, output_file=None):
+    if output_file is not None:
+        try:
+            os.remove(_partial_file(output_file))
+        except OSError:
+            pass
+    store.mark(job["id"], "cancelled")
+    _publish(store, "trim_task_cancelled", job, f"Task {job['id']} cancelled.")
+
+def _cache_lookup(store, cache, job, start_sec, end_sec, output_dir, mode):
+    """
+    Tries to serve a job from the clip cache. Returns (served, key): key is what a
+    freshly cut clip should be cached under, or None when caching is off or unavailable.
+    """
+    if cache is None:
+        return False, None
+    try:
+        settings = (mode, partial_hash(job["audio"])) if job.get("audio") else (mode,)
+        key = cache.key(job["video"], start_sec, end_sec, settings)
+    except OSError:
+        return False, None
+    output_file = _output_file(job, output_dir)
+    if not cache.fetch(key, output_file):
+        return False, key
+    store.mark(job["id"], "done", output=str(output_file))
+    _publish(store, "trim_task_complete", job, f"Saved: {output_file} (from cache)")
+    return True, key
+
+def _cut_one(store, job, start_sec, end_sec, output_dir, mode="copy", cache=None, cache_key=None):
+    output_file = _output_file(job, output_dir)
+    partial = _partial_file(output_file)
+
+    drift = None
+    if mode == "copy":
+        snap = keyframe_drift(job["video"], start_sec, build=False)
+        drift = snap[1] if snap else None
+    note = None
+    progress = _progress_reporter(store, [(job["id"], 0.0, end_sec - start_sec)])
+    try:
+        # Waits here while the job is paused before it has started.
+        with subprocess_engine.job(trim_key(store, job["id"])):
+            _publish_started(store, job, output_file, drift)
+            audio = job.get("audio")
+            if mode == "smart":
+                note = _cut_smart(job["video"], start_sec, end_sec, partial, progress, audio)
+            elif mode == "reencode":
+                _cut_reencode(job["video"], start_sec, end_sec - start_sec, partial, progress=progress, audio_file=audio)
+            else:
+                _cut_copy(job["video"], job["start"], end_sec - start_sec, partial, progress, audio)
+    except JobCancelled:
+        _cancel(store, job, output_file)
+        return
+    except subprocess.CalledProcessError as e:
+        message = f"Error processing task {job['id']}: {e}"
+        if e.stderr:
+            message += f" ({e.stderr.splitlines()[-1]})"
+        _fail(store, job, message, output_file)
+        return
+    _complete(store, job, output_file, note, cache, cache_key)
+
+def _cut_each(store, items, output_dir, mode="copy", cache=None):
+    """Cuts (job, start_sec, end_sec, cache_key) items one by one; an error fails only its own job."""
+    for job, start_sec, end_sec, key in items:
+        try:
+            _cut_one(store, job, start_sec, end_sec, output_dir, mode, cache, key)
+        except Exception as e:
+            _fail(store, job, f"Error processing task {job['id']}: {e}", _output_file(job, output_dir))
+
+def _trim_group(store, jobs, output_dir, mode="copy", cache=None):
+    """
+    Cuts every job in jobs from one source video with a single ffmpeg run.
+    The input is opened and demuxed once; each range is written to its own output
+    using output-side seeking relative to the earliest start in the group.
+    Each output seeks to the keyframe before its start (from the keyframe index),
+    matching what an input-side seek on a single task would produce. Without an
+    index that cannot be done, so the tasks are cut one by one instead.
+    Only stream-copy cuts are grouped; other modes cut each task on its own.
+    Jobs whose clip is already in the cache are served from it without running ffmpeg.
+    """
+    valid = []
+    for job in jobs:
+        times = _validate(store, job)
+        if times is None:
+            continue
+        served, key = _cache_lookup(store, cache, job, times[0], times[1], output_dir, mode)
+        if not served:
+            valid.append((job, times[0], times[1], key))
+    index = None
+    if len(valid) >= 2 and mode == "copy":
+        index = get_keyframe_index(valid[0][0]["video"])
+    if index is None or not len(index):
+        # An output-side seek without a known keyframe would start the clip at the
+        # next keyframe after its start, dropping footage a single cut keeps. An
+        # index without keyframes (e.g. an audio-only source) is no better.
+        _cut_each(store, valid, output_dir, mode, cache)
+        return
+
+    video_file = valid[0][0]["video"]
+    base_sec = min(start_sec for _, start_sec, _, _ in valid)
+    audio_input, maps = _audio_input(valid[0][0].get("audio"), base_sec)
+    cmd = ["ffmpeg", "-y", "-ss", str(base_sec), "-i", video_file, *audio_input]
+    windows = []
+    started = []
+    for job, start_sec, end_sec, _ in valid:
+        output_file = _output_file(job, output_dir)
+        keyframe = index.before(start_sec)
+        drift = start_sec - keyframe
+        if keyframe > base_sec:
+            # Stream copy drops packets whose decode time precedes -ss, so seek
+            # to the keyframe's dts (less a millisecond for rounding).
+            cut_sec = index.decode_time(keyframe) - 0.001
+        else:
+            # Same GOP as the earliest range: an output-side seek into it would
+            # drop everything up to the next keyframe, so start with the input seek.
+            cut_sec = base_sec
+        offset = cut_sec - base_sec
+        if offset > 0:
+            cmd += ["-ss", f"{offset:.6f}"]
+        cmd += [
+            "-t", f"{end_sec - max(cut_sec, base_sec):.6f}",
+            *maps,
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            str(_partial_file(output_file))
+        ]
+        windows.append((job["id"], start_sec - base_sec, end_sec - start_sec))
+        started.append((job, output_file, drift))
+
+    partials = [str(_partial_file(output_file)) for _, output_file, _ in started]
+    keys = {job["id"]: trim_key(store, job["id"]) for job, _, _, _ in valid}
+    cancelled = set()
+    try:
+        # The pass belongs to every job in it: pausing or cancelling one stops them all.
+        with subprocess_engine.job(*keys.values()):
+            for job, output_file, drift in started:
+                _publish_started(store, job, output_file, drift)
             try:
-                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                event_bus.publish("trim_task_complete", f"Saved: {output_file}")
-            except subprocess.CalledProcessError as e:
-                event_bus.publish("trim_task_failed", f"Error processing task {idx+1}: {e}")
-        event_bus.publish("trim_queue_complete", None)
-        
-    threading.Thread(target=_process, daemon=True).start()
+                # Progress of a multi-output pass is approximate: ffmpeg reports one
+                # position for the run, which is mapped onto each job's window.
+                _run(cmd, _progress_reporter(store, windows), partials)
+            except JobCancelled:
+                # Read the flags before leaving the scope forgets them.
+                cancelled = {job_id for job_id, key in keys.items() if subprocess_engine.is_cancelled(key)}
+                raise
+    except (JobCancelled, subprocess.CalledProcessError):
+        # One bad range fails the whole pass; redo the tasks one by one so
+        # each of them gets its own complete/failed event. The same goes for
+        # the jobs that shared a pass with a cancelled one.
+        for job, _, _, _ in valid:
+            if job["id"] in cancelled:
+                _cancel(store, job)
+        _cut_each(store, [item for item in valid if item[0]["id"] not in cancelled], output_dir, mode, cache)
+        return
+    for job, _, _, key in valid:
+        _complete(store, job, _output_file(job, output_dir), cache=cache, cache_key=key)
+
+def _group_by_video(jobs):
+    """Groups jobs by source file, in chunks of at most MAX_OUTPUTS_PER_PASS."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job["video"], job.get("audio")), []).append(job)
+    chunks = []
+    for items in groups.values():
+        items.sort(key=lambda job: time_to_seconds(job["start"]) or 0)
+        for i in range(0, len(items), MAX_OUTPUTS_PER_PASS):
+            chunks.append(items[i:i + MAX_OUTPUTS_PER_PASS])
+    return chunks
+
+def trim_groups(jobs, mode="copy"):
+    """Splits jobs into the units one worker runs: a pass per source video in copy mode, else one job each."""
+    if mode == "copy":
+        return _group_by_video(jobs)
+    return [[job] for job in jobs]
+
+def run_trim_group(store, jobs, mode="copy", cache=clip_cache, output_dir=None):
+    """
+    Cuts one group from trim_groups on the calling thread, writing to videos/trimmed
+    unless output_dir is given. Failures are recorded on the jobs, never raised.
+    """
+    if output_dir is None:
+        output_dir = project_dir("trimmed")
+    since = time.time()
+    try:
+        _trim_group(store, jobs, output_dir, mode, cache)
+    except JobCancelled:
+        for job in _unsettled(store, jobs, since):
+            _cancel(store, job)
+    except Exception as e:
+        for job in _unsettled(store, jobs, since):
+            _fail(store, job, f"Error processing task {job['id']}: {e}")
+
+def _unsettled(store, jobs, since):
+    """The jobs that have not reached an outcome since the group started (done, failed and cancelled ones are left alone)."""
+    unsettled = []
+    for job in jobs:
+        row = store.get(job["id"])
+        if row is not None and (row["state"] in ("pending", "running") or (row["updated"] or 0) < since):
+            unsettled.append(job)
+    return unsettled
+
+class TrimRun(threading.Thread):
+    """
+    The coordinating thread of a process_trim_tasks run. cancel(), pause() and resume()
+    act on its jobs through core.engine: all of them, or only the given job ids.
+    Jobs paused before they start wait for resume(); cancelled jobs end up 'cancelled'.
+    """
+    def __init__(self, store, job_ids, target):
+        super().__init__(target=target, daemon=True)
+        self.store = store
+        self.job_ids = list(job_ids)
+
+    def _keys(self, job_ids=None):
+        return [trim_key(self.store, job_id) for job_id in (self.job_ids if job_ids is None else job_ids)]
+
+    def cancel(self, job_ids=None):
+        for key in self._keys(job_ids):
+            subprocess_engine.cancel(key)
+
+    def pause(self, job_ids=None):
+        for key in self._keys(job_ids):
+            subprocess_engine.pause(key)
+
+    def resume(self, job_ids=None):
+        for key in self._keys(job_ids):
+            subprocess_engine.resume(key)
+
+def process_trim_tasks(tasks, max_workers=None, mode="copy", cache=clip_cache, job_ids=None):
+    """
+    Runs the unfinished jobs of a JobStore on a bounded pool of worker threads, each
+    driving one ffmpeg process. A plain list of task dicts is loaded into a throwaway
+    in-memory store first. Jobs left 'running' by a crash are picked up again and
+    finished jobs are skipped, so restarting a queue only redoes unfinished work.
+    In copy mode, tasks that share a source video are cut together in a single ffmpeg pass.
+    Clips already produced with the same source, range and mode are taken from cache
+    (pass cache=None to always re-cut); its hit/miss counters are published as
+    'clip_cache_stats' at the end of the run. job_ids limits the run to those jobs of the store.
+    Returns the coordinating TrimRun thread; 'trim_queue_complete' is published once every
+    task has finished or was cancelled ('trim_task_cancelled'). Like the trim_task_* events,
+    it carries the store's path, so a listener can tell its own queue apart.
+    """
+    if mode not in TRIM_MODES:
+        raise ValueError(f"Unknown trim mode: {mode}")
+    if isinstance(tasks, JobStore):
+        store = tasks
+    else:
+        store = JobStore(":memory:")
+        store.add_many(tasks)
+    jobs = store.unfinished()
+    if job_ids is not None:
+        job_ids = set(job_ids)
+        jobs = [job for job in jobs if job["id"] in job_ids]
+    groups = trim_groups(jobs, mode)
+    if max_workers is None:
+        max_workers = default_trim_workers()
+    max_workers = max(1, min(int(max_workers), len(groups) or 1))
+
+    def _process():
+        output_dir = project_dir("trimmed")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trim") as pool:
+            for items in groups:
+                pool.submit(run_trim_group, store, items, mode, cache, output_dir)
+        # Drop cancel/pause flags left on jobs that never got to run.
+        for key in thread._keys():
+            subprocess_engine.release(key)
+        if cache is not None:
+            cache.publish_stats()
+        event_bus.publish("trim_queue_complete", {"store": store.path})
+
+    thread = TrimRun(store, [job["id"] for job in jobs], _process)
+    thread.start()
+    return thread
@@ -0,0 +1,217 @@
+import os
+import subprocess
+import threading
+from core.engine import subprocess_engine
+from core.ffmpeg import probe_duration
+from core.paths import cache_dir, signature_key
+
+# Audio is analysed as mono s16le PCM at SAMPLE_RATE, summarised per bucket of
+# BUCKET_SECONDS: a 10-hour VOD becomes 360,000 buckets, a few MB.
+SAMPLE_RATE = 8000
+BUCKET_SECONDS = 0.1
+# Short-term loudness window (as in EBU R128), centred on each bucket.
+SHORT_TERM_SECONDS = 3.0
+# Level reported for digital silence.
+SILENCE_DB = -100.0
+
+_VERSION = 1
+
+_memory_cache = {}
+_lock = threading.Lock()
+
+def _numpy():
+    import numpy  # Heavy; loaded on first analysis
+    return numpy
+
+def pcm_command(media_file, sample_rate=SAMPLE_RATE):
+    """ffmpeg command decoding the first audio stream of media_file to mono s16le PCM on stdout."""
+    return [
+        "ffmpeg", "-v", "error",
+        "-i", media_file,
+        "-map", "0:a:0",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-f", "s16le",
+        "pipe:1"
+    ]
+
+class PcmBuckets:
+    """
+    Summarises s16le PCM fed in chunks of any length into the minimum, maximum and RMS
+    of every bucket of `size` samples, one vectorized pass per chunk. Only the
+    per-bucket results and less than one bucket of samples are kept.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.samples = 0
+        self._pending = b""
+        self._mins = []
+        self._maxs = []
+        self._rms = []
+
+    def feed(self, data):
+        np = _numpy()
+        data = self._pending + data
+        usable = len(data) - len(data) % (2 * self.size)
+        self._pending = data[usable:]
+        if usable:
+            self._add(np.frombuffer(data, dtype="<i2", count=usable // 2).reshape(-1, self.size))
+
+    def _add(self, block):
+        np = _numpy()
+        self.samples += block.size
+        self._mins.append(block.min(axis=1))
+        self._maxs.append(block.max(axis=1))
+        samples = block.astype(np.float32)
+        self._rms.append(np.sqrt(np.mean(samples * samples, axis=1)))
+
+    def finish(self):
+        """(mins, maxs, rms) as float32 arrays scaled to -1..1, including the last partial bucket."""
+        np = _numpy()
+        tail = len(self._pending) // 2
+        if tail:
+            self._add(np.frombuffer(self._pending, dtype="<i2", count=tail).reshape(1, tail))
+            self._pending = b""
+        if not self._mins:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+        scale = np.float32(1 / 32768)
+        return (
+            np.concatenate(self._mins).astype(np.float32) * scale,
+            np.concatenate(self._maxs).astype(np.float32) * scale,
+            np.concatenate(self._rms) * scale,
+        )
+
+def short_term_loudness(rms, bucket_seconds=BUCKET_SECONDS, window=SHORT_TERM_SECONDS):
+    """Level in dBFS of the mean power over a window centred on each bucket (unweighted)."""
+    np = _numpy()
+    count = len(rms)
+    width = max(int(round(window / bucket_seconds)), 1)
+    power = np.concatenate(([0.0], np.cumsum(rms.astype(np.float64) ** 2)))
+    index = np.arange(count)
+    lo = np.maximum(index - width // 2, 0)
+    hi = np.minimum(index + width - width // 2, count)
+    mean = (power[hi] - power[lo]) / np.maximum(hi - lo, 1)
+    with np.errstate(divide="ignore"):
+        return np.maximum(10 * np.log10(mean), SILENCE_DB).astype(np.float32)
+
+class Waveform:
+    """
+    Audio overview of a media file. For each bucket of bucket_seconds: the lowest and
+    highest sample (-1..1), the RMS level and the short-term loudness in dBFS.
+    """
+
+    def __init__(self, mins, maxs, rms, loudness, bucket_seconds=BUCKET_SECONDS):
+        self.mins = mins
+        self.maxs = maxs
+        self.rms = rms
+        self.loudness = loudness
+        self.bucket_seconds = bucket_seconds
+
+    def __len__(self):
+        return len(self.mins)
+
+    @property
+    def duration(self):
+        return len(self.mins) * self.bucket_seconds
+
+    def envelope(self, width):
+        """
+        (mins, maxs, loudness) for a timeline width columns wide covering the whole file:
+        the extremes and the loudest short-term level of the buckets under each column.
+        """
+        np = _numpy()
+        if not len(self.mins) or width < 1:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+        starts = np.minimum(np.linspace(0, len(self.mins), width, endpoint=False).astype(np.int64), len(self.mins) - 1)
+        return (
+            np.minimum.reduceat(self.mins, starts),
+            np.maximum.reduceat(self.maxs, starts),
+            np.maximum.reduceat(self.loudness, starts),
+        )
+
+    def save(self, path):
+        np = _numpy()
+        # Two loads of the same file may both be analysing it; each writes its own tmp.
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, version=_VERSION, bucket_seconds=self.bucket_seconds,
+                mins=self.mins, maxs=self.maxs, rms=self.rms, loudness=self.loudness
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        np = _numpy()
+        with np.load(path) as data:
+            if int(data["version"]) != _VERSION:
+                raise ValueError(f"Not a current waveform: {path}")
+            return cls(data["mins"], data["maxs"], data["rms"], data["loudness"], float(data["bucket_seconds"]))
+
+def waveform_key(media_file):
+    """core.engine job key of the waveform analysis of media_file."""
+    return ("waveform", os.path.abspath(media_file))
+
+def compute_waveform(media_file, on_progress=None, key=None):
+    """
+    Decodes the audio of media_file once, streaming PCM from ffmpeg through PcmBuckets,
+    so memory stays bounded however long the file is. on_progress(percent) is called as
+    the audio comes in. Runs as engine job key (default waveform_key(media_file)); raises
+    JobCancelled if that is cancelled and subprocess.CalledProcessError if there is no audio.
+    """
+    try:
+        duration = probe_duration(media_file)
+    except ValueError:
+        duration = None
+    buckets = PcmBuckets(int(SAMPLE_RATE * BUCKET_SECONDS))
+
+    def _on_data(data):
+        buckets.feed(data)
+        if on_progress is not None and duration:
+            on_progress(min(100.0, buckets.samples / SAMPLE_RATE / duration * 100))
+
+    cmd = pcm_command(media_file)
+    with subprocess_engine.job(key or waveform_key(media_file)):
+        returncode, tail = subprocess_engine.run(cmd, on_data=_on_data)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=tail)
+    mins, maxs, rms = buckets.finish()
+    return Waveform(mins, maxs, rms, short_term_loudness(rms))
+
+def _cache_path(media_file):
+    return cache_dir("waveform") / f"{signature_key(media_file)}.npz"
+
+def get_waveform(media_file, build=True, on_progress=None, key=None):
+    """
+    Returns the Waveform of media_file from memory or the on-disk cache, else computes
+    it as engine job key (see compute_waveform) unless build is False. Entries are keyed by path, size and
+    mtime. Returns None when the file has no readable audio or NumPy is not installed.
+    """
+    try:
+        path = _cache_path(media_file)
+        _numpy()
+    except (OSError, ImportError):
+        return None
+    with _lock:
+        waveform = _memory_cache.get(path)
+    if waveform is not None:
+        return waveform
+    if path.exists():
+        try:
+            waveform = Waveform.load(path)
+        except (OSError, ValueError, KeyError):
+            waveform = None
+    if waveform is None:
+        if not build:
+            return None
+        try:
+            waveform = compute_waveform(media_file, on_progress, key)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        waveform.save(path)
+    with _lock:
+        _memory_cache[path] = waveform
+    return waveform
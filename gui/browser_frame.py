@@ -1,5 +1,4 @@
 import tkinter as tk
-import webview
 import threading
 from tkinter import ttk, messagebox
 
@@ -61,6 +60,7 @@ class BrowserFrame(tk.Frame):
         """
         Starts the PyWebView browser in a separate thread.
         """
+        import webview  # Loaded on first use, it pulls in a browser engine
         webview.create_window(
             "YouTube Browser",
             url="https://www.youtube.com",
@@ -73,6 +73,7 @@ class BrowserFrame(tk.Frame):
         """
         Gets the current URL from PyWebView and sends it to the parent frame.
         """
+        import webview
         if not webview.windows:
             messagebox.showwarning("Browser Not Ready", "The browser is still loading. Try again in a few seconds.")
             return
@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk
+from core.engine import subprocess_engine
 from .downloader_frame import DownloaderFrame
 from .trimmer_frame import TrimmerFrame
 
@@ -11,6 +12,13 @@ class ComprehensiveApp:
         self.root = root
         self.root.title("Clip Farming Tool")
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # Kill running ffmpeg processes and let the jobs remove their partial outputs
+        # instead of leaving half-written files behind.
+        subprocess_engine.shutdown()
+        self.root.destroy()
 
     def create_widgets(self):
         self.notebook = ttk.Notebook(self.root)
@@ -4,20 +4,35 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 from core.event_bus import event_bus
-from core.downloader import download_video
+from core.downloader import already_downloaded, download_manager, iter_playlist_entries
+from core.pipeline import Pipeline
+from core.trimmer import time_to_seconds
+from .tk_dispatcher import TkDispatcher
 
 class DownloaderFrame(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        event_bus.subscribe("download_complete", self.on_download_complete)
-        event_bus.subscribe("download_failed", self.on_download_failed)
+        self.listed_job_ids = []
+        self.pipeline = None  # Created on first use for range downloads
+        # Download events are published on worker threads; handle them on the Tk main loop.
+        self.dispatcher = TkDispatcher(self)
+        event_bus.subscribe("download_queued", self.on_download_queued, self.dispatcher)
+        event_bus.subscribe("download_started", self.on_download_started, self.dispatcher)
+        event_bus.subscribe("download_progress", self.on_download_progress, self.dispatcher)
+        event_bus.subscribe("download_format_chosen", self.on_download_format_chosen, self.dispatcher)
+        event_bus.subscribe("download_session_stats", self.on_download_session_stats, self.dispatcher)
+        event_bus.subscribe("download_complete", self.on_download_complete, self.dispatcher)
+        event_bus.subscribe("download_failed", self.on_download_failed, self.dispatcher)
+        event_bus.subscribe("download_cancelled", self.on_download_cancelled, self.dispatcher)
+        event_bus.subscribe("download_entry_skipped", self.on_download_entry_skipped, self.dispatcher)
+        event_bus.subscribe("download_feed_failed", self.on_download_feed_failed, self.dispatcher)
         self._create_widgets()
 
     def _create_widgets(self):
         """
         Creates the original Downloader layout (no embedded browser).
         """
-        lbl_url = tk.Label(self, text="YouTube URL:")
+        lbl_url = tk.Label(self, text="YouTube URL(s):")
         lbl_url.grid(row=0, column=0, padx=5, pady=5, sticky="e")
 
         self.entry_url = tk.Entry(self, width=50)
@@ -34,43 +49,234 @@ class DownloaderFrame(tk.Frame):
             state="readonly"
         )
         self.dropdown_res.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.separate_var = tk.BooleanVar(value=download_manager.separate_streams)
+        chk_separate = tk.Checkbutton(
+            self,
+            text="Keep video/audio separate (skip merge)",
+            variable=self.separate_var,
+            command=lambda: download_manager.set_separate_streams(self.separate_var.get())
+        )
+        chk_separate.grid(row=1, column=1, padx=(200, 5), pady=5, sticky="w")
 
         self.auto_load_var = tk.BooleanVar(value=True)
         chk_auto = tk.Checkbutton(self, text="Auto-load into Trimmer", variable=self.auto_load_var)
         chk_auto.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        self.clip_formats_var = tk.BooleanVar(value=download_manager.format_policy == "clip")
+        chk_clip = tk.Checkbutton(
+            self,
+            text="Clip-optimized formats (H.264/AAC, trims without re-encoding)",
+            variable=self.clip_formats_var,
+            command=self.update_format_policy
+        )
+        chk_clip.grid(row=2, column=1, padx=(200, 5), pady=5, sticky="w")
+
+        # e.g. "1:02:10-1:02:55, 1:40:00-1:40:30": only those parts are downloaded, then trimmed.
+        lbl_ranges = tk.Label(self, text="Trim ranges (optional):")
+        lbl_ranges.grid(row=3, column=0, padx=5, pady=5, sticky="e")
+        self.entry_ranges = tk.Entry(self, width=50)
+        self.entry_ranges.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+        frame_actions = tk.Frame(self)
+        frame_actions.grid(row=4, column=1, padx=5, pady=10, sticky="w")
+        self.btn_download = tk.Button(frame_actions, text="Download", command=self.start_download)
+        self.btn_download.pack(side="left")
+        tk.Label(frame_actions, text="Parallel downloads:").pack(side="left", padx=(10, 0))
+        self.spin_parallel = tk.Spinbox(frame_actions, from_=1, to=16, width=3, command=self.update_parallel)
+        self.spin_parallel.delete(0, tk.END)
+        self.spin_parallel.insert(0, str(download_manager.max_concurrent))
+        self.spin_parallel.pack(side="left", padx=5)
+        tk.Label(frame_actions, text="Fragments per download:").pack(side="left", padx=(10, 0))
+        self.fragments_var = tk.StringVar(value=str(download_manager.concurrent_fragments))
+        dropdown_fragments = ttk.Combobox(
+            frame_actions,
+            textvariable=self.fragments_var,
+            values=["auto", "1", "2", "4", "8", "16"],
+            width=5
+        )
+        dropdown_fragments.pack(side="left", padx=5)
+        dropdown_fragments.bind("<<ComboboxSelected>>", lambda e: self.update_fragments())
+
+        frame_jobs = tk.Frame(self)
+        frame_jobs.grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        self.listbox_jobs = tk.Listbox(frame_jobs, height=6)
+        self.listbox_jobs.pack(side="left", fill="both", expand=True)
+        frame_job_buttons = tk.Frame(frame_jobs)
+        frame_job_buttons.pack(side="left", padx=5, anchor="n")
+        btn_cancel = tk.Button(frame_job_buttons, text="Cancel", command=self.cancel_selected)
+        btn_cancel.pack(fill="x", pady=2)
+        btn_pause = tk.Button(frame_job_buttons, text="Pause", command=self.pause_selected)
+        btn_pause.pack(fill="x", pady=2)
+        btn_resume = tk.Button(frame_job_buttons, text="Resume", command=self.resume_selected)
+        btn_resume.pack(fill="x", pady=2)
 
-        self.btn_download = tk.Button(self, text="Download", command=self.start_download)
-        self.btn_download.grid(row=3, column=1, padx=5, pady=10, sticky="w")
+        self.lbl_progress = tk.Label(self, text="", anchor="w")
+        self.lbl_progress.grid(row=6, column=0, columnspan=2, padx=5, sticky="we")
 
         self.text_log = tk.Text(self, height=5)
-        self.text_log.grid(row=4, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        self.text_log.grid(row=7, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
 
-        self.grid_rowconfigure(4, weight=1)
+        self.grid_rowconfigure(5, weight=1)
+        self.grid_rowconfigure(7, weight=1)
         self.grid_columnconfigure(1, weight=1)
 
     def log(self, message):
         self.text_log.insert(tk.END, message + "\n")
         self.text_log.see(tk.END)
 
+    def update_job_listbox(self):
+        jobs = download_manager.jobs()
+        self.listed_job_ids = [job.id for job in jobs]
+        self.listbox_jobs.delete(0, tk.END)
+        for job in jobs:
+            self.listbox_jobs.insert(tk.END, f"#{job.id} [{job.state}] {job.url}")
+
+    def update_parallel(self):
+        try:
+            download_manager.set_max_concurrent(int(self.spin_parallel.get()))
+        except ValueError:
+            pass
+
+    def update_format_policy(self):
+        download_manager.set_format_policy("clip" if self.clip_formats_var.get() else "default")
+
+    def update_fragments(self):
+        try:
+            download_manager.set_concurrent_fragments(self.fragments_var.get().strip() or "auto")
+        except ValueError:
+            self.fragments_var.set(str(download_manager.concurrent_fragments))
+
     def start_download(self):
         """
         Called when the user clicks the 'Download' button.
+        Several URLs separated by whitespace are queued as separate downloads;
+        playlists and channels are expanded into their videos as they are listed.
         """
-        url = self.entry_url.get().strip()
-        if not url:
+        urls = self.entry_url.get().split()
+        if not urls:
             messagebox.showwarning("Missing URL", "Please enter a YouTube URL.")
             return
-        self.btn_download.config(state="disabled")
-        self.log("Starting download...")
-        download_video(url, self.res_var.get(), self.auto_load_var.get())
-
-    def on_download_complete(self, filename):
-        self.log("Download complete.")
-        self.log(f"Saved as: {filename}")
-        self.btn_download.config(state="normal")
-        if self.auto_load_var.get():
-            event_bus.publish("auto_load_video", filename)
-
-    def on_download_failed(self, error_message):
-        self.log(f"Download failed: {error_message}")
-        self.btn_download.config(state="normal")
+        ranges = self.parse_ranges(self.entry_ranges.get())
+        if ranges is None:
+            messagebox.showerror("Invalid Ranges", "Enter trim ranges as START-END, separated by commas.")
+            return
+        self.update_parallel()
+        self.update_fragments()
+        for url in urls:
+            if ranges:
+                if self.pipeline is None:
+                    # Trims run in the pipeline's own slots while downloads continue.
+                    self.pipeline = Pipeline(manager=download_manager, ranges_only=True)
+                self.pipeline.resolution = self.res_var.get()
+                self.pipeline.submit(url, ranges)
+            else:
+                # A video entered on its own is always queued, so a copy already in the library
+                # is reused (and loaded, if asked); only videos listed from a playlist are skipped.
+                skip = lambda entry, resolution, url=url: entry["url"] != url and already_downloaded(entry, resolution)
+                download_manager.submit_many(iter_playlist_entries(url), self.res_var.get(), self.auto_load_var.get(),
+                                             skip=skip)
+        self.entry_url.delete(0, tk.END)
+
+    @staticmethod
+    def parse_ranges(text):
+        """Comma-separated START-END times -> [(start, end)], or None if any is invalid."""
+        ranges = []
+        for part in text.split(","):
+            if not part.strip():
+                continue
+            start, _, end = part.partition("-")
+            start, end = start.strip(), end.strip()
+            start_sec, end_sec = time_to_seconds(start), time_to_seconds(end)
+            if start_sec is None or end_sec is None or end_sec <= start_sec:
+                return None
+            ranges.append((start, end))
+        return ranges
+
+    def cancel_selected(self):
+        selection = self.listbox_jobs.curselection()
+        if not selection:
+            return
+        download_manager.cancel(self.listed_job_ids[selection[0]])
+
+    def pause_selected(self):
+        selection = self.listbox_jobs.curselection()
+        if selection and download_manager.pause(self.listed_job_ids[selection[0]]):
+            self.log(f"Paused download #{self.listed_job_ids[selection[0]]}.")
+
+    def resume_selected(self):
+        selection = self.listbox_jobs.curselection()
+        if selection and download_manager.resume(self.listed_job_ids[selection[0]]):
+            self.log(f"Resumed download #{self.listed_job_ids[selection[0]]}.")
+
+    def on_download_queued(self, data):
+        self.log(f"Queued download #{data['job_id']}: {data['url']}")
+        self.update_job_listbox()
+
+    def on_download_started(self, data):
+        self.log(f"Starting download #{data['job_id']}...")
+        self.update_job_listbox()
+
+    @staticmethod
+    def format_bytes(size):
+        for unit in ("B", "KiB", "MiB", "GiB"):
+            if size < 1024 or unit == "GiB":
+                return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+            size /= 1024
+
+    def on_download_format_chosen(self, data):
+        self.log(f"Download #{data['job_id']} format {data['format']}: {data['reason']}")
+
+    def on_download_progress(self, data):
+        text = f"#{data['job_id']}: {self.format_bytes(data['downloaded_bytes'])}"
+        if data["total_bytes"]:
+            text += f" of {self.format_bytes(data['total_bytes'])} ({data['percent']:.1f}%)"
+        if data["speed"]:
+            text += f" at {self.format_bytes(data['speed'])}/s"
+        if data["average_speed"]:
+            text += f", avg {self.format_bytes(data['average_speed'])}/s"
+        if data["eta"] is not None and not data["done"]:
+            text += f", ETA {int(data['eta']) // 60}:{int(data['eta']) % 60:02d}"
+        if data["fragment_count"]:
+            text += f", fragment {data['fragment_index']}/{data['fragment_count']}"
+        self.lbl_progress.config(text=text)
+
+    def on_download_session_stats(self, stats):
+        speed = f"{self.format_bytes(stats['mean_speed'])}/s" if stats["mean_speed"] else "n/a"
+        self.log(
+            f"Session: {stats['downloads']} download(s), {self.format_bytes(stats['bytes'])} "
+            f"in {stats['seconds']:.1f}s, mean {speed}"
+        )
+
+    def on_download_complete(self, data):
+        self.log(f"Download #{data['job_id']} complete.")
+        if data.get("pieces"):
+            self.log(f"Fetched {len(data['pieces'])} range piece(s); trimming them now.")
+            self.update_job_listbox()
+            return
+        if data.get("reused"):
+            self.log(f"Already in the library: {data['filename']}")
+        else:
+            self.log(f"Saved as: {data['filename']}")
+        if data.get("audio"):
+            self.log(f"Audio kept separately as: {data['audio']}")
+        self.update_job_listbox()
+        if data.get("auto_load"):
+            # As chosen when the download was queued, not the checkbox's current state.
+            # The trimmer accepts a plain file name or a video/audio pair.
+            if data.get("audio"):
+                event_bus.publish("auto_load_video", {"video": data["filename"], "audio": data["audio"]})
+            else:
+                event_bus.publish("auto_load_video", data["filename"])
+
+    def on_download_failed(self, data):
+        self.log(f"Download #{data['job_id']} failed: {data['error']}")
+        self.update_job_listbox()
+
+    def on_download_cancelled(self, data):
+        self.log(f"Download #{data['job_id']} cancelled.")
+        self.update_job_listbox()
+
+    def on_download_entry_skipped(self, entry):
+        self.log(f"Skipped (already in the library): {entry.get('title') or entry['url']}")
+
+    def on_download_feed_failed(self, data):
+        self.log(f"Could not list videos: {data['error']}")
@@ -0,0 +1,179 @@
+# filmstrip_view.py
+
+import collections
+import itertools
+import threading
+import tkinter as tk
+from core.engine import JobCancelled, subprocess_engine
+from core.filmstrip import TILE_HEIGHT, filmstrip_key, get_filmstrip
+from core.trimmer import seconds_to_time
+
+# Decoded sprite sheets and thumbnails kept in memory; the least recently used go first.
+SHEET_CACHE_SIZE = 4
+TILE_CACHE_SIZE = 256
+# Thumbnails in the strip are the sheet's tiles shrunk by this factor; hover shows them full size.
+STRIP_SUBSAMPLE = 2
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = collections.OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+class FilmstripView:
+    """
+    Strip of thumbnails covering the whole video, shown under the VideoPreview. Hovering
+    shows the thumbnail at that position full size, cut from the cached sprite sheets
+    (see core.filmstrip) without decoding any video; clicking calls on_select(seconds).
+    Sheets are generated on a background thread and drawn as soon as each is written.
+    """
+
+    def __init__(self, parent, dispatcher, on_select=None, width=400):
+        self.dispatcher = dispatcher
+        self.on_select = on_select
+        self.video_file = None
+        self.strip = None
+        # Each load generates under its own engine key, so cancelling one never affects a
+        # later load of the same video.
+        self._loads = itertools.count()
+        self._key = None
+        self._sheets = LRUCache(SHEET_CACHE_SIZE)
+        self._tiles = LRUCache(TILE_CACHE_SIZE)
+        self._strip_images = []  # Tk drops images nothing references
+        self._hover = None
+
+        self.canvas = tk.Canvas(parent, width=width, height=TILE_HEIGHT // STRIP_SUBSAMPLE, bg="black",
+                                highlightthickness=0)
+        self.canvas.pack(fill="x", pady=(2, 0))
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<Leave>", lambda event: self.hide_hover())
+        self.canvas.bind("<Button-1>", self.on_click)
+
+    def load(self, video_file):
+        if video_file == self.video_file:
+            return
+        if self._key is not None:
+            # Stop generating the previous video's strip (a finished one is unaffected).
+            subprocess_engine.cancel(self._key)
+            subprocess_engine.release(self._key)
+        self.video_file = video_file
+        self._key = (*filmstrip_key(video_file), next(self._loads))
+        self.strip = None
+        self._sheets.clear()
+        self._tiles.clear()
+        self.redraw()
+        threading.Thread(target=self._generate, args=(video_file, self._key), daemon=True).start()
+
+    def _generate(self, video_file, key):
+        try:
+            get_filmstrip(
+                video_file,
+                key=key,
+                on_start=lambda strip: self.dispatcher.dispatch("filmstrip_started", self._on_start, (video_file, strip)),
+                on_sheet=lambda strip, sheet: self.dispatcher.dispatch("filmstrip_sheet", self._on_sheet, video_file),
+            )
+        except JobCancelled:
+            pass
+
+    def _on_start(self, data):
+        video_file, strip = data
+        if video_file == self.video_file:
+            self.strip = strip
+            self.redraw()
+
+    def _on_sheet(self, video_file):
+        if video_file == self.video_file:
+            self.redraw()
+
+    def _sheet_image(self, sheet):
+        image = self._sheets.get(sheet)
+        if image is None:
+            image = tk.PhotoImage(file=str(self.strip.sheet_path(sheet)))
+            self._sheets.put(sheet, image)
+        return image
+
+    def tile_image(self, index, subsample=1):
+        """The thumbnail at index as a PhotoImage, or None while its sheet is still being generated."""
+        key = (index, subsample)
+        image = self._tiles.get(key)
+        if image is None:
+            sheet, (x1, y1, x2, y2) = self.strip.tile(index)
+            if not self.strip.has_sheet(sheet):
+                return None
+            try:
+                sheet_image = self._sheet_image(sheet)
+            except tk.TclError:
+                return None  # The finished strip was moved into place as we looked
+            image = tk.PhotoImage()
+            image.tk.call(image, "copy", sheet_image, "-from", x1, y1, x2, y2,
+                          "-subsample", subsample, subsample)
+            self._tiles.put(key, image)
+        return image
+
+    def _slots(self):
+        """Thumbnails that fit across the canvas: (x, time) of each, evenly covering the video."""
+        thumb_width = self.strip.tile_width // STRIP_SUBSAMPLE
+        width = max(self.canvas.winfo_width(), thumb_width)
+        count = max(width // thumb_width, 1)
+        step = width / count
+        return [(int(i * step), (i + 0.5) * self.strip.duration / count) for i in range(count)]
+
+    def redraw(self):
+        self.canvas.delete("all")
+        self._strip_images = []
+        if self.strip is None:
+            return
+        height = self.strip.tile_height // STRIP_SUBSAMPLE
+        for x, t in self._slots():
+            image = self.tile_image(self.strip.index_at(t), STRIP_SUBSAMPLE)
+            if image is None:
+                self.canvas.create_rectangle(x, 0, x + self.strip.tile_width // STRIP_SUBSAMPLE - 1, height,
+                                             fill="#3C3F41", outline="")
+            else:
+                self.canvas.create_image(x, 0, image=image, anchor="nw")
+                self._strip_images.append(image)
+
+    def time_at(self, x):
+        width = max(self.canvas.winfo_width(), 1)
+        return min(max(x / width, 0.0), 1.0) * self.strip.duration
+
+    def on_motion(self, event):
+        if self.strip is None:
+            return
+        t = self.time_at(event.x)
+        image = self.tile_image(self.strip.index_at(t))
+        if image is None:
+            self.hide_hover()
+            return
+        if self._hover is None:
+            self._hover = tk.Toplevel(self.canvas)
+            self._hover.overrideredirect(True)
+            self._hover_label = tk.Label(self._hover, compound="top", bd=1, relief="solid")
+            self._hover_label.pack()
+        self._hover_label.config(image=image, text=seconds_to_time(t)[:8])
+        self._hover_label.image = image
+        self._hover.geometry(f"+{event.x_root - image.width() // 2}+{event.y_root - image.height() - 40}")
+        self._hover.deiconify()
+
+    def hide_hover(self):
+        if self._hover is not None:
+            self._hover.withdraw()
+
+    def on_click(self, event):
+        if self.strip is not None and self.on_select is not None:
+            self.on_select(self.time_at(event.x))
@@ -1,9 +1,26 @@
 # gui_shell.py
 
+import importlib
+import threading
 import tkinter as tk
 from tkinter import ttk
 from .comprehensive_app import ComprehensiveApp  # relative import from the same package
 
+# Heavy backends imported in the background once the window is up, so the
+# first download or preview does not stall the UI.
+WARM_UP_MODULES = ("yt_dlp", "vlc")
+
+def warm_up_backends(modules=WARM_UP_MODULES):
+    def _warm_up():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass  # Reported properly when the feature is first used
+    thread = threading.Thread(target=_warm_up, daemon=True)
+    thread.start()
+    return thread
+
 def main():
     root = tk.Tk()
     root.title("Clip Farming Tool - Dark Mode")
@@ -123,6 +140,7 @@ def main():
 
     # 4) Instantiate the main app container and run
     app = ComprehensiveApp(root)
+    root.after(200, warm_up_backends)
     root.mainloop()
 
 
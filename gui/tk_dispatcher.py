@@ -0,0 +1,99 @@
+# tk_dispatcher.py
+
+import collections
+import sys
+import threading
+import tkinter as tk
+
+# Callbacks run per drain before control goes back to Tk; the rest follow right after.
+MAX_BATCH = 100
+# High-frequency events and the field (or tuple of fields) identifying what they report
+# on: only the latest event per value of it (or per callback, for None) is delivered.
+COALESCED_EVENTS = {
+    "download_progress": "job_id",
+    "trim_task_progress": ("store", "task"),
+    "preview_time_changed": None,
+    "waveform_progress": None,
+    "highlight_scan_progress": "video",
+}
+
+class TkDispatcher:
+    """
+    Event bus dispatcher that runs callbacks on the Tk main loop:
+    event_bus.subscribe(name, callback, dispatcher). dispatch() can be called from any
+    thread and returns at once; events are queued and drained in batches, in the order
+    they were published. The first event queued while the dispatcher is idle posts a
+    virtual event to wake the Tk loop, so nothing runs while no events come in.
+    Coalesced events keep their place in the queue but are delivered with the latest
+    data published before the drain.
+    """
+
+    def __init__(self, widget, batch=MAX_BATCH, coalesce=COALESCED_EVENTS):
+        self.widget = widget
+        self.batch = batch
+        self.coalesce = dict(coalesce)
+        self.delivered = 0
+        self.coalesced = 0
+        self._queue = collections.deque()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._scheduled = False  # A drain is pending; later events ride along with it
+        # Posted on the root window, which exists (and is mapped) as long as the main loop runs.
+        self._root = widget._root()
+        self._wake = f"<<DispatchEvents{id(self)}>>"
+        self._root.bind(self._wake, lambda event: self._drain())
+
+    def dispatch(self, event_name, callback, data):
+        with self._lock:
+            if event_name not in self.coalesce:
+                self._queue.append((callback, data, None))
+            else:
+                field = self.coalesce[event_name]
+                value = None
+                if field and isinstance(data, dict):
+                    value = tuple(map(data.get, field)) if isinstance(field, tuple) else data.get(field)
+                key = (event_name, callback, value)
+                if key in self._latest:
+                    self.coalesced += 1
+                else:
+                    self._queue.append((callback, None, key))
+                self._latest[key] = data
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            # Thread-safe: Tk queues the event behind whatever it is doing now.
+            self._root.event_generate(self._wake, when="tail")
+        except (tk.TclError, RuntimeError):
+            # The widget was destroyed or the main loop is not running (yet).
+            with self._lock:
+                self._scheduled = False
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def _drain(self):
+        with self._lock:
+            items = []
+            while self._queue and len(items) < self.batch:
+                callback, data, key = self._queue.popleft()
+                if key is not None:
+                    data = self._latest.pop(key)
+                items.append((callback, data))
+            more = bool(self._queue)
+            if not more:
+                self._scheduled = False
+        for callback, data in items:
+            try:
+                callback(data)
+            except Exception:
+                # Reported like any other Tk callback error; the rest of the batch still runs.
+                self.widget._root().report_callback_exception(*sys.exc_info())
+        self.delivered += len(items)
+        if more:
+            # Let Tk handle input and redraw between batches.
+            try:
+                self.widget.after(1, self._drain)
+            except tk.TclError:
+                pass  # The widget was destroyed.
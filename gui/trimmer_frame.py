@@ -1,23 +1,43 @@
 # trimmer_frame.py
 
 import os
+import subprocess
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox
+from core.engine import JobCancelled
 from core.event_bus import event_bus
-from core.trimmer import process_trim_tasks
+from core.highlights import propose_highlights
+from core.job_store import JobStore
+from core.trimmer import process_trim_tasks, default_trim_workers, seconds_to_time, TRIM_MODES
+from .tk_dispatcher import TkDispatcher
 from .video_preview import VideoPreview
 
 class TrimmerFrame(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.tasks = []
+        self.store = JobStore()
+        self.listed_job_ids = []
+        self.trim_run = None  # The running queue, see core.trimmer.TrimRun
         self.current_video_file = None
+        self.current_audio_file = None  # separately downloaded audio for current_video_file
+        # Trim and player events arrive on other threads; handle them on the Tk main loop.
+        self.dispatcher = TkDispatcher(self)
         self.create_widgets()
-        event_bus.subscribe("auto_load_video", self.load_video_for_trimming)
-        event_bus.subscribe("trim_task_started", self.on_trim_task_started)
-        event_bus.subscribe("trim_task_complete", self.on_trim_task_complete)
-        event_bus.subscribe("trim_task_failed", self.on_trim_task_failed)
-        event_bus.subscribe("trim_queue_complete", self.on_trim_queue_complete)
+        self.update_task_listbox()
+        unfinished = len(self.store.unfinished())
+        if unfinished:
+            self.log(f"Restored {unfinished} unfinished task(s) from the previous session.")
+        event_bus.subscribe("auto_load_video", self.load_video_for_trimming, self.dispatcher)
+        event_bus.subscribe("trim_task_started", self.on_trim_task_started, self.dispatcher)
+        event_bus.subscribe("trim_task_complete", self.on_trim_task_complete, self.dispatcher)
+        event_bus.subscribe("trim_task_failed", self.on_trim_task_failed, self.dispatcher)
+        event_bus.subscribe("trim_task_cancelled", self.on_trim_task_cancelled, self.dispatcher)
+        event_bus.subscribe("trim_task_progress", self.on_trim_task_progress, self.dispatcher)
+        event_bus.subscribe("trim_queue_complete", self.on_trim_queue_complete, self.dispatcher)
+        event_bus.subscribe("clip_cache_stats", self.on_clip_cache_stats, self.dispatcher)
+        event_bus.subscribe("highlight_scan_progress", self.on_highlight_scan_progress, self.dispatcher)
+        event_bus.subscribe("highlight_scan_complete", self.on_highlight_scan_complete, self.dispatcher)
 
     def create_widgets(self):
         frame_task_create = tk.Frame(self)
@@ -57,10 +77,13 @@ class TrimmerFrame(tk.Frame):
         btn_preview = tk.Button(frame_task_create, text="Preview Range", command=self.preview_range)
         btn_preview.grid(row=4, column=0, columnspan=2, pady=5)
 
+        self.btn_highlights = tk.Button(frame_task_create, text="Find Highlights", command=self.find_highlights)
+        self.btn_highlights.grid(row=5, column=0, columnspan=2, pady=5)
+
         frame_preview = tk.Frame(self)
         frame_preview.pack(padx=10, pady=10, fill="x")
         tk.Label(frame_preview, text="Video Preview:").pack(anchor="w")
-        self.video_preview = VideoPreview(frame_preview)
+        self.video_preview = VideoPreview(frame_preview, self.dispatcher)
 
         frame_queue = tk.Frame(self)
         frame_queue.pack(padx=10, pady=5, fill="both", expand=True)
@@ -78,9 +101,35 @@ class TrimmerFrame(tk.Frame):
         btn_up.pack(fill="x", pady=2)
         btn_down = tk.Button(frame_queue_buttons, text="Move Down", command=self.move_task_down)
         btn_down.pack(fill="x", pady=2)
+        btn_clear_done = tk.Button(frame_queue_buttons, text="Clear Done", command=self.clear_done_tasks)
+        btn_clear_done.pack(fill="x", pady=2)
 
-        self.btn_start_queue = tk.Button(self, text="Start Queue", command=self.start_queue)
-        self.btn_start_queue.pack(pady=10)
+        frame_run = tk.Frame(self)
+        frame_run.pack(pady=10)
+        tk.Label(frame_run, text="Parallel jobs:").pack(side="left")
+        self.spin_workers = tk.Spinbox(frame_run, from_=1, to=256, width=4)
+        self.spin_workers.delete(0, tk.END)
+        self.spin_workers.insert(0, str(default_trim_workers()))
+        self.spin_workers.pack(side="left", padx=5)
+        tk.Label(frame_run, text="Cut mode:").pack(side="left")
+        self.mode_var = tk.StringVar(value=TRIM_MODES[0])
+        self.dropdown_mode = ttk.Combobox(
+            frame_run,
+            textvariable=self.mode_var,
+            values=TRIM_MODES,
+            state="readonly",
+            width=9
+        )
+        self.dropdown_mode.pack(side="left", padx=5)
+        self.btn_start_queue = tk.Button(frame_run, text="Start Queue", command=self.start_queue)
+        self.btn_start_queue.pack(side="left", padx=5)
+        # Act on the selected task, or on the whole running queue when none is selected.
+        tk.Button(frame_run, text="Pause", command=self.pause_queue).pack(side="left", padx=2)
+        tk.Button(frame_run, text="Resume", command=self.resume_queue).pack(side="left", padx=2)
+        tk.Button(frame_run, text="Cancel", command=self.cancel_queue).pack(side="left", padx=2)
+
+        self.lbl_progress = tk.Label(self, text="", anchor="w")
+        self.lbl_progress.pack(padx=10, fill="x")
 
         self.text_log = tk.Text(self, height=8)
         self.text_log.pack(padx=10, pady=5, fill="both", expand=True)
@@ -96,12 +145,21 @@ class TrimmerFrame(tk.Frame):
         )
         if file_path:
             self.current_video_file = file_path
+            self.current_audio_file = None
             self.lbl_current_video.config(text=os.path.basename(file_path))
 
     def load_video_for_trimming(self, video_file):
+        # Either a file name or {"video", "audio"} when the streams were downloaded separately.
+        audio_file = None
+        if isinstance(video_file, dict):
+            video_file, audio_file = video_file["video"], video_file.get("audio")
         self.current_video_file = video_file
-        self.lbl_current_video.config(text=os.path.basename(video_file))
-        self.video_preview.load_video(video_file)
+        self.current_audio_file = audio_file
+        label = os.path.basename(video_file)
+        if audio_file:
+            label += f" + {os.path.basename(audio_file)}"
+        self.lbl_current_video.config(text=label)
+        self.video_preview.load_video(video_file, audio_file)
 
     def preview_range(self):
         if not self.current_video_file:
@@ -109,10 +167,15 @@ class TrimmerFrame(tk.Frame):
             return
         start = f"{int(self.spin_start_hour.get()):02}:{int(self.spin_start_minute.get()):02}:{int(self.spin_start_second.get()):02}"
         end = f"{int(self.spin_end_hour.get()):02}:{int(self.spin_end_minute.get()):02}:{int(self.spin_end_second.get()):02}"
-        self.video_preview.load_video(self.current_video_file)
+        self.video_preview.load_video(self.current_video_file, self.current_audio_file)
         self.video_preview.set_range(start, end)
         self.video_preview.player.play()
         self.video_preview.btn_play_pause.config(text="Pause")
+        keyframes = self.video_preview.keyframes_around(self.video_preview.preview_start_ms)
+        if keyframes and keyframes[0] is not None:
+            drift = (self.video_preview.preview_start_ms - keyframes[0]) / 1000
+            if drift > 0:
+                self.log(f"Stream-copy cut will start at keyframe {seconds_to_time(keyframes[0] / 1000)} ({drift:.2f}s early).")
 
     def add_task(self):
         if not self.current_video_file:
@@ -121,12 +184,34 @@ class TrimmerFrame(tk.Frame):
         start = f"{int(self.spin_start_hour.get()):02}:{int(self.spin_start_minute.get()):02}:{int(self.spin_start_second.get()):02}"
         end = f"{int(self.spin_end_hour.get()):02}:{int(self.spin_end_minute.get()):02}:{int(self.spin_end_second.get()):02}"
         task = {"video": self.current_video_file, "start": start, "end": end}
-        self.tasks.append(task)
+        if self.current_audio_file:
+            task["audio"] = self.current_audio_file
+        self.store.add(task)
         self.update_task_listbox()
         self.current_video_file = None
+        self.current_audio_file = None
         self.lbl_current_video.config(text="No video selected")
         self.reset_spinboxes()
 
+    def find_highlights(self):
+        if not self.current_video_file:
+            messagebox.showwarning("No Video Selected", "Please select a video file to scan for highlights.")
+            return
+        video_file, audio_file = self.current_video_file, self.current_audio_file
+        self.btn_highlights.config(state="disabled")
+        self.log(f"Scanning {os.path.basename(video_file)} for highlights...")
+        threading.Thread(target=self._find_highlights, args=(video_file, audio_file), daemon=True).start()
+
+    def _find_highlights(self, video_file, audio_file):
+        try:
+            tasks = propose_highlights(video_file, audio_file)
+        except JobCancelled:
+            tasks = []
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            self.dispatcher.dispatch("highlight_scan_failed", self.on_highlight_scan_failed, str(e))
+            return
+        self.dispatcher.dispatch("highlight_tasks_proposed", self.on_highlight_tasks_proposed, tasks)
+
     def reset_spinboxes(self):
         for spin in [
             self.spin_start_hour,
@@ -140,17 +225,23 @@ class TrimmerFrame(tk.Frame):
             spin.insert(0, "00")
 
     def update_task_listbox(self):
+        jobs = self.store.jobs()
+        self.listed_job_ids = [job["id"] for job in jobs]
         self.listbox_tasks.delete(0, tk.END)
-        for idx, task in enumerate(self.tasks):
-            video_name = os.path.basename(task["video"])
-            self.listbox_tasks.insert(tk.END, f"{idx+1}: {video_name} | {task['start']} - {task['end']}")
+        for idx, job in enumerate(jobs):
+            video_name = os.path.basename(job["video"])
+            self.listbox_tasks.insert(tk.END, f"{idx+1}: {video_name} | {job['start']} - {job['end']} [{job['state']}]")
 
     def remove_task(self):
         selection = self.listbox_tasks.curselection()
         if not selection:
             return
         index = selection[0]
-        del self.tasks[index]
+        self.store.remove(self.listed_job_ids[index])
+        self.update_task_listbox()
+
+    def clear_done_tasks(self):
+        self.store.clear(("done",))
         self.update_task_listbox()
 
     def move_task_up(self):
@@ -160,7 +251,7 @@ class TrimmerFrame(tk.Frame):
         index = selection[0]
         if index == 0:
             return
-        self.tasks[index-1], self.tasks[index] = self.tasks[index], self.tasks[index-1]
+        self.store.swap(self.listed_job_ids[index-1], self.listed_job_ids[index])
         self.update_task_listbox()
         self.listbox_tasks.selection_set(index-1)
 
@@ -169,28 +260,118 @@ class TrimmerFrame(tk.Frame):
         if not selection:
             return
         index = selection[0]
-        if index >= len(self.tasks) - 1:
+        if index >= len(self.listed_job_ids) - 1:
             return
-        self.tasks[index], self.tasks[index+1] = self.tasks[index+1], self.tasks[index]
+        self.store.swap(self.listed_job_ids[index], self.listed_job_ids[index+1])
         self.update_task_listbox()
         self.listbox_tasks.selection_set(index+1)
 
     def start_queue(self):
-        if not self.tasks:
-            messagebox.showwarning("No Tasks", "No trim tasks in the queue.")
+        if not self.store.unfinished():
+            messagebox.showwarning("No Tasks", "No unfinished trim tasks in the queue.")
             return
+        try:
+            workers = int(self.spin_workers.get())
+        except ValueError:
+            workers = default_trim_workers()
         self.btn_start_queue.config(state="disabled")
-        process_trim_tasks(self.tasks)
+        self.trim_run = process_trim_tasks(self.store, max_workers=workers, mode=self.mode_var.get())
+        self.update_task_listbox()
+
+    def _selected_job_ids(self):
+        """Ids of the selected tasks, or None (the whole run) when nothing is selected."""
+        selection = self.listbox_tasks.curselection()
+        if not selection:
+            return None
+        return [self.listed_job_ids[i] for i in selection]
+
+    def pause_queue(self):
+        if self.trim_run is not None:
+            self.trim_run.pause(self._selected_job_ids())
+            self.log("Paused.")
+
+    def resume_queue(self):
+        if self.trim_run is not None:
+            self.trim_run.resume(self._selected_job_ids())
+            self.log("Resumed.")
 
-    def on_trim_task_started(self, message):
-        self.log(message)
+    def cancel_queue(self):
+        if self.trim_run is not None:
+            self.trim_run.cancel(self._selected_job_ids())
 
-    def on_trim_task_complete(self, message):
-        self.log(message)
+    def _own(self, data):
+        """True for events of this frame's queue, not of trims run elsewhere (pipeline, range downloads)."""
+        return data["store"] == self.store.path
 
-    def on_trim_task_failed(self, message):
-        self.log(message)
+    def on_trim_task_started(self, data):
+        if self._own(data):
+            self.log(data["message"])
 
-    def on_trim_queue_complete(self, _):
+    def on_trim_task_complete(self, data):
+        if self._own(data):
+            self.log(data["message"])
+            self.update_task_listbox()
+
+    def on_trim_task_failed(self, data):
+        if self._own(data):
+            self.log(data["message"])
+            self.update_task_listbox()
+
+    def on_trim_task_cancelled(self, data):
+        if self._own(data):
+            self.log(data["message"])
+            self.update_task_listbox()
+
+    def on_trim_task_progress(self, progress):
+        if not self._own(progress):
+            return
+        text = f"Task {progress['task']}"
+        if progress["percent"] is not None:
+            text += f": {progress['percent']:.0f}%"
+        if progress["speed"]:
+            text += f" at {progress['speed']:.1f}x"
+        self.lbl_progress.config(text=text)
+
+    def on_highlight_scan_progress(self, progress):
+        self.lbl_progress.config(
+            text=f"Scanning for highlights: {progress['percent']:.0f}% at {progress['x_realtime']:.1f}x realtime"
+        )
+
+    def on_highlight_scan_complete(self, result):
+        speed = f" ({result['x_realtime']}x realtime)" if result["x_realtime"] is not None else ""
+        self.log(
+            f"Scanned {seconds_to_time(result['duration'])} in {result['seconds']:.1f}s{speed}, "
+            f"{result['cuts']} scene cut(s)."
+        )
+        for candidate in result["candidates"]:
+            self.log(
+                f"Highlight {seconds_to_time(candidate['start'])} - {seconds_to_time(candidate['end'])}: "
+                f"score {candidate['score']}, {candidate['cuts']} cut(s)"
+            )
+
+    def on_highlight_scan_failed(self, message):
+        self.log(f"Highlight scan failed: {message}")
+        self.lbl_progress.config(text="")
+        self.btn_highlights.config(state="normal")
+
+    def on_highlight_tasks_proposed(self, tasks):
+        self.lbl_progress.config(text="")
+        self.btn_highlights.config(state="normal")
+        if not tasks:
+            self.log("No highlights found.")
+            return
+        self.store.add_many(tasks)
+        self.update_task_listbox()
+        self.log(f"Added {len(tasks)} proposed highlight clip(s) to the queue; remove any you don't want before starting it.")
+
+    def on_clip_cache_stats(self, stats):
+        self.log(f"Clip cache: {stats['hits']} hit(s), {stats['misses']} miss(es).")
+
+    def on_trim_queue_complete(self, data):
+        if not self._own(data):
+            return
         self.log("Queue processing complete.")
+        self.lbl_progress.config(text="")
+        self.update_task_listbox()
         self.btn_start_queue.config(state="normal")
+        self.trim_run = None
@@ -1,22 +1,41 @@
 # video_preview.py
 
 import os
+import threading
 import tkinter as tk
-import vlc
+from pathlib import Path
+from core.keyframes import get_keyframe_index
+from .filmstrip_view import FilmstripView
+from .tk_dispatcher import TkDispatcher
+from .waveform_view import WaveformView
 
 class VideoPreview:
-    def __init__(self, parent):
+    """
+    libVLC player for previewing a trim range. The slider and the A-B loop are driven by
+    libVLC's player events (handed to the Tk main loop by dispatcher), so nothing runs
+    while the player is idle. The media of the current file is kept and reused.
+    A filmstrip and an audio overview under the video show the whole file; clicking them seeks there.
+    """
+    def __init__(self, parent, dispatcher=None):
         self.parent = parent
-        self.instance = vlc.Instance()
-        self.player = self.instance.media_player_new()
+        self._instance = None
+        self._player = None
+        self.media = None
+        self._media_source = None  # (video_file, audio_file) self.media was created for
+        self._pending_seek_ms = None  # applied once playback has started
         self.preview_start_ms = 0
         self.preview_end_ms = 0
         self.slider_dragging = False
+        self.video_file = None
+        self.keyframe_index = None
 
         self.frame = tk.Frame(parent)
         self.frame.pack(fill="x", padx=10, pady=5)
+        self.dispatcher = dispatcher or TkDispatcher(self.frame)
         self.canvas = tk.Canvas(self.frame, width=400, height=300, bg="black")
         self.canvas.pack()
+        self.filmstrip = FilmstripView(self.frame, self.dispatcher, on_select=lambda t: self.seek(int(t * 1000)))
+        self.waveform = WaveformView(self.frame, self.dispatcher, on_select=lambda t: self.seek(int(t * 1000)))
 
         self.controls_frame = tk.Frame(self.frame)
         self.controls_frame.pack(fill="x", pady=5)
@@ -39,15 +58,77 @@ class VideoPreview:
         self.slider.bind("<ButtonPress-1>", self.on_slider_press)
         self.slider.bind("<ButtonRelease-1>", self.on_slider_release)
 
-        self.update_slider()
-
-    def load_video(self, video_file):
+    @property
+    def instance(self):
+        if self._instance is None:
+            import vlc  # libVLC is slow to load; defer it until a video is actually used
+            self._instance = vlc.Instance()
+        return self._instance
+
+    @property
+    def player(self):
+        if self._player is None:
+            import vlc
+            self._player = self.instance.media_player_new()
+            if os.name == "nt":
+                self._player.set_hwnd(self.canvas.winfo_id())
+            else:
+                self._player.set_xwindow(self.canvas.winfo_id())
+            # libVLC raises these on its own threads, where neither libVLC nor Tk may be
+            # called: queue them for the Tk main loop. Time updates are coalesced.
+            events = self._player.event_manager()
+            events.event_attach(
+                vlc.EventType.MediaPlayerTimeChanged,
+                lambda event: self.dispatcher.dispatch("preview_time_changed", self.on_time_changed, event.u.new_time)
+            )
+            events.event_attach(
+                vlc.EventType.MediaPlayerPlaying,
+                lambda event: self.dispatcher.dispatch("preview_playing", self.on_playing, None)
+            )
+            events.event_attach(
+                vlc.EventType.MediaPlayerEndReached,
+                lambda event: self.dispatcher.dispatch("preview_end_reached", self.on_end_reached, None)
+            )
+        return self._player
+
+    def load_video(self, video_file, audio_file=None):
+        if video_file != self.video_file:
+            self.video_file = video_file
+            self.keyframe_index = None
+            threading.Thread(target=self._load_keyframe_index, args=(video_file,), daemon=True).start()
+            self.filmstrip.load(video_file)
+        self.waveform.load(audio_file or video_file)
+        if (video_file, audio_file) == self._media_source:
+            return  # Already loaded and parsed: previewing another range starts at once
+        import vlc
         self.media = self.instance.media_new(video_file)
+        if audio_file:
+            # Separately downloaded audio plays as a slave track of the video.
+            self.media.slaves_add(vlc.MediaSlaveType.audio, 4, Path(audio_file).resolve().as_uri())
+        # Parse in the background so tracks and duration are known by the first play.
+        self.media.parse_with_options(vlc.MediaParseFlag.local, -1)
         self.player.set_media(self.media)
-        if os.name == "nt":
-            self.player.set_hwnd(self.canvas.winfo_id())
-        else:
-            self.player.set_xwindow(self.canvas.winfo_id())
+        self._media_source = (video_file, audio_file)
+
+    def _load_keyframe_index(self, video_file):
+        index = get_keyframe_index(video_file)
+        if video_file == self.video_file:
+            self.keyframe_index = index
+
+    def keyframes_around(self, time_ms):
+        """
+        Returns (before_ms, after_ms), the keyframes surrounding time_ms, or None while
+        the index for the current video is still being built. after_ms is None past the last keyframe.
+        """
+        index = self.keyframe_index
+        if index is None:
+            return None
+        before = index.before(time_ms / 1000)
+        after = index.after(time_ms / 1000)
+        return (
+            int(before * 1000) if before is not None else None,
+            int(after * 1000) if after is not None else None
+        )
 
     def set_range(self, start_time_str, end_time_str):
         self.preview_start_ms = self.time_str_to_ms(start_time_str)
@@ -56,7 +137,16 @@ class VideoPreview:
             self.slider.config(from_=0, to=self.preview_end_ms - self.preview_start_ms)
         else:
             self.slider.config(from_=0, to=0)
-        self.player.set_time(self.preview_start_ms)
+        self.waveform.set_range(self.preview_start_ms / 1000, self.preview_end_ms / 1000)
+        self.seek(self.preview_start_ms)
+
+    def seek(self, time_ms):
+        import vlc
+        if self.player.get_state() in (vlc.State.Playing, vlc.State.Paused):
+            self.player.set_time(time_ms)
+        else:
+            # A stopped or ended player ignores seeks until it is playing again.
+            self._pending_seek_ms = time_ms
 
     def time_str_to_ms(self, time_str):
         parts = time_str.split(":")
@@ -74,6 +164,9 @@ class VideoPreview:
             self.player.pause()
             self.btn_play_pause.config(text="Play")
         else:
+            import vlc
+            if self.player.get_state() != vlc.State.Paused:
+                self.seek(self.preview_start_ms)  # Start over from the range, not the file
             self.player.play()
             self.btn_play_pause.config(text="Pause")
 
@@ -93,14 +186,24 @@ class VideoPreview:
     def on_slider_release(self, event):
         self.slider_dragging = False
 
-    def update_slider(self):
-        if self.player.is_playing() and not self.slider_dragging:
-            current_time = self.player.get_time()
-            if current_time < self.preview_start_ms:
-                current_time = self.preview_start_ms
-            if current_time > self.preview_end_ms:
-                self.player.set_time(self.preview_start_ms)
-                current_time = self.preview_start_ms
-            slider_value = current_time - self.preview_start_ms
-            self.slider.set(slider_value)
-        self.parent.after(200, self.update_slider)
+    def on_playing(self, _):
+        if self._pending_seek_ms is not None:
+            self.player.set_time(self._pending_seek_ms)
+            self._pending_seek_ms = None
+
+    def on_time_changed(self, time_ms):
+        # A-B loop: back to the start of the range once playback passes its end.
+        if self.preview_end_ms > self.preview_start_ms and time_ms >= self.preview_end_ms:
+            self.player.set_time(self.preview_start_ms)
+            time_ms = self.preview_start_ms
+        if not self.slider_dragging:
+            self.slider.set(max(time_ms - self.preview_start_ms, 0))
+
+    def on_end_reached(self, _):
+        if self.preview_end_ms > self.preview_start_ms:
+            # The file ended inside the range: restart it and seek to the range's start.
+            self._pending_seek_ms = self.preview_start_ms
+            self.player.stop()
+            self.player.play()
+        else:
+            self.btn_play_pause.config(text="Play")
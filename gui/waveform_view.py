@@ -0,0 +1,108 @@
+# waveform_view.py
+
+import itertools
+import threading
+import tkinter as tk
+from core.engine import JobCancelled, subprocess_engine
+from core.waveform import get_waveform, waveform_key
+
+HEIGHT = 48
+# Loudness range drawn from the bottom (LOUDNESS_FLOOR_DB) to the top (0 dBFS) of the view.
+LOUDNESS_FLOOR_DB = -60.0
+
+class WaveformView:
+    """
+    Audio overview of the whole file under the filmstrip: the waveform's extremes per
+    pixel column and a line for the short-term loudness, so loud moments stand out. The
+    trim range is shaded and clicking calls on_select(seconds). The analysis (see
+    core.waveform) runs on a background thread and is cached per file.
+    """
+
+    def __init__(self, parent, dispatcher, on_select=None, width=400):
+        self.dispatcher = dispatcher
+        self.on_select = on_select
+        self.media_file = None
+        self.waveform = None
+        self.range = None
+        # Each load analyses under its own engine key, so cancelling one never affects a
+        # later load of the same file.
+        self._loads = itertools.count()
+        self._key = None
+
+        self.canvas = tk.Canvas(parent, width=width, height=HEIGHT, bg="black", highlightthickness=0)
+        self.canvas.pack(fill="x", pady=(2, 0))
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Button-1>", self.on_click)
+
+    def load(self, media_file):
+        if media_file == self.media_file:
+            return
+        if self._key is not None:
+            # Stop analysing the previous file (a finished analysis is unaffected).
+            subprocess_engine.cancel(self._key)
+            subprocess_engine.release(self._key)
+        self.media_file = media_file
+        self._key = (*waveform_key(media_file), next(self._loads))
+        self.waveform = None
+        self.show_status("Analyzing audio...")
+        threading.Thread(target=self._analyze, args=(media_file, self._key), daemon=True).start()
+
+    def _analyze(self, media_file, key):
+        try:
+            waveform = get_waveform(
+                media_file,
+                key=key,
+                on_progress=lambda percent: self.dispatcher.dispatch("waveform_progress", self._on_progress, (media_file, percent))
+            )
+        except JobCancelled:
+            return
+        self.dispatcher.dispatch("waveform_ready", self._on_ready, (media_file, waveform))
+
+    def _on_progress(self, data):
+        media_file, percent = data
+        if media_file == self.media_file and self.waveform is None:
+            self.show_status(f"Analyzing audio... {percent:.0f}%")
+
+    def _on_ready(self, data):
+        media_file, waveform = data
+        if media_file != self.media_file:
+            return
+        self.waveform = waveform
+        if waveform is None:
+            self.show_status("No audio overview")
+        else:
+            self.redraw()
+
+    def set_range(self, start, end):
+        """Shades start..end (seconds) as the trim range; None clears it."""
+        self.range = (start, end) if start is not None and end > start else None
+        self.redraw()
+
+    def show_status(self, text):
+        self.canvas.delete("all")
+        self.canvas.create_text(6, HEIGHT // 2, text=text, anchor="w", fill="#9DA5B4")
+
+    def redraw(self):
+        if self.waveform is None or not len(self.waveform):
+            return
+        self.canvas.delete("all")
+        width = max(self.canvas.winfo_width(), 2)
+        mid = HEIGHT / 2
+        if self.range is not None:
+            duration = self.waveform.duration
+            x1, x2 = (int(t / duration * width) for t in self.range)
+            self.canvas.create_rectangle(x1, 0, x2, HEIGHT, fill="#2F4F6F", outline="")
+        mins, maxs, loudness = self.waveform.envelope(width)
+        # The waveform as one polygon: the maxima left to right, then the minima back.
+        top = [(x, mid - v * mid) for x, v in enumerate(maxs.tolist())]
+        bottom = [(x, mid - v * mid) for x, v in reversed(list(enumerate(mins.tolist())))]
+        self.canvas.create_polygon(top + bottom, fill="#4E9A06", outline="")
+        scale = HEIGHT / -LOUDNESS_FLOOR_DB
+        line = [(x, -max(db, LOUDNESS_FLOOR_DB) * scale) for x, db in enumerate(loudness.tolist())]
+        if len(line) > 1:
+            self.canvas.create_line(line, fill="#F5C211")
+
+    def on_click(self, event):
+        if self.waveform is not None and len(self.waveform) and self.on_select is not None:
+            width = max(self.canvas.winfo_width(), 1)
+            self.on_select(min(max(event.x / width, 0.0), 1.0) * self.waveform.duration)
@@ -0,0 +1,44 @@
+"""Test media made with ffmpeg, and what ffmpeg -i says about a file (no ffprobe needed)."""
+import re
+import shutil
+import subprocess
+
+FFMPEG = shutil.which("ffmpeg")
+FPS = 25
+
+def make_video(path, seconds, gop_seconds=2, size="320x240", noise=False, faststart=False):
+    """
+    H.264 + AAC test clip with a keyframe exactly every gop_seconds and no B-frames,
+    so the keyframe times (and their decode times) are known without probing.
+    """
+    source = f"testsrc2=size={size}:rate={FPS}:duration={seconds}"
+    if noise:
+        source += ",noise=alls=40:allf=t"  # Every second costs real bytes
+    cmd = [
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", source,
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-g", str(gop_seconds * FPS), "-keyint_min", str(gop_seconds * FPS), "-sc_threshold", "0", "-bf", "0",
+        "-c:a", "aac", "-shortest",
+    ]
+    if faststart:
+        cmd += ["-movflags", "+faststart"]
+    subprocess.run(cmd + [str(path)], check=True)
+
+def keyframe_times(seconds, gop_seconds=2):
+    """Keyframe times of a make_video clip."""
+    return [float(t) for t in range(0, seconds, gop_seconds)]
+
+def _info(media_file):
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", str(media_file)], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    return result.stderr
+
+def duration(media_file):
+    """Container duration in seconds as reported by ffmpeg -i."""
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", _info(media_file)).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def stream_count(media_file):
+    return _info(media_file).count("Stream #0:")
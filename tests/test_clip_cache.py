@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.clip_cache import ClipCache
+
+SIZE = 1000
+
+class ClipCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.cache = ClipCache(os.path.join(self.tmp, "cache"), max_bytes=int(SIZE * 2.5))
+        os.makedirs(self.cache.directory)
+        self.source = self.file("source.mp4", b"source video")
+
+    def file(self, name, data=None):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data if data is not None else name.encode("utf-8").ljust(SIZE, b"."))
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_keys(self):
+        key = self.cache.key(self.source, 1.0, 2.0, ("copy",))
+        self.assertEqual(key, self.cache.key(self.source, 1.0, 2.0, ("copy",)))
+        self.assertNotEqual(key, self.cache.key(self.source, 1.0, 2.5, ("copy",)))
+        self.assertNotEqual(key, self.cache.key(self.source, 1.0, 2.0, ("smart",)))
+        # Keyed on content, not on the path: a moved source still hits.
+        moved = self.file("moved.mp4", b"source video")
+        self.assertEqual(key, self.cache.key(moved, 1.0, 2.0, ("copy",)))
+        other = self.file("other.mp4", b"another video")
+        self.assertNotEqual(key, self.cache.key(other, 1.0, 2.0, ("copy",)))
+
+    def test_miss_put_hit(self):
+        key = self.cache.key(self.source, 1.0, 2.0, ("copy",))
+        output = os.path.join(self.tmp, "again.mp4")
+        self.assertFalse(self.cache.fetch(key, output))
+        self.assertFalse(os.path.exists(output))
+        clip = self.file("clip.mp4")
+        self.cache.put(key, clip)
+        self.assertTrue(self.cache.fetch(key, output))
+        self.assertEqual(self.read(output), self.read(clip))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1})
+        # Fetching onto the clip it was made from leaves it alone.
+        self.assertTrue(self.cache.fetch(key, clip))
+        self.assertEqual(self.read(clip), self.read(output))
+
+    def test_hit_keeps_the_users_clip_mtime(self):
+        key = self.cache.key(self.source, 1.0, 2.0, ("copy",))
+        clip = self.file("clip.mp4")
+        self.cache.put(key, clip)
+        os.utime(clip, (1000, 1000))
+        self.assertTrue(self.cache.fetch(key, os.path.join(self.tmp, "again.mp4")))
+        self.assertEqual(os.stat(clip).st_mtime, 1000)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = {name: self.cache.key(self.source, i, i + 1, ("copy",)) for i, name in enumerate("abc")}
+        self.cache.put(keys["a"], self.file("a.mp4"))
+        self.cache.put(keys["b"], self.file("b.mp4"))
+        os.utime(self.cache._marker(keys["a"]), (100, 100))
+        os.utime(self.cache._marker(keys["b"]), (200, 200))
+        # a was put first but used last, so b is the one to go.
+        self.assertTrue(self.cache.fetch(keys["a"], os.path.join(self.tmp, "a2.mp4")))
+        self.cache.put(keys["c"], self.file("c.mp4"))
+        entries = set(os.listdir(self.cache.directory)) - {".used"}
+        self.assertEqual(entries, {keys["a"], keys["c"]})
+        self.assertFalse(os.path.exists(self.cache._marker(keys["b"])))
+        self.assertFalse(self.cache.fetch(keys["b"], os.path.join(self.tmp, "b2.mp4")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from core.engine import JobCancelled, SubprocessEngine
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+# Prints "ready", then a tick every 20 ms for about two seconds.
+TICKER = python("import time\nprint('ready', flush=True)\nfor i in range(100):\n    print(i, flush=True)\n    time.sleep(0.02)")
+
+class EngineTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = SubprocessEngine()
+        self.addCleanup(self.engine.shutdown)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def output(self, name="out.bin"):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(b"partial")
+        return path
+
+    def start(self, key, cmd, **kwargs):
+        """Runs cmd as job key on a worker thread; returns (thread, result dict, lines, ready event)."""
+        result = {}
+        lines = []
+        ready = threading.Event()
+
+        def _on_line(line):
+            lines.append(line.strip())
+            ready.set()
+
+        def _work():
+            try:
+                with self.engine.job(key):
+                    result["value"] = self.engine.run(cmd, on_line=_on_line, **kwargs)
+            except JobCancelled:
+                result["cancelled"] = True
+
+        thread = threading.Thread(target=_work, daemon=True)
+        thread.start()
+        return thread, result, lines, ready
+
+    def test_run_collects_output(self):
+        lines = []
+        returncode, tail = self.engine.run(
+            python("import sys\nprint('a')\nprint('b')\nsys.stderr.write('noise\\nerror\\n')"),
+            on_line=lambda line: lines.append(line.strip()),
+            on_stderr=lambda line: line == "noise",
+        )
+        self.assertEqual(returncode, 0)
+        self.assertEqual(lines, ["a", "b"])
+        self.assertEqual(tail, "error")
+
+    def test_run_streams_binary_output(self):
+        chunks = []
+        self.engine.run(python("import sys\nsys.stdout.buffer.write(bytes(range(256)) * 4096)"), on_data=chunks.append)
+        data = b"".join(chunks)
+        self.assertEqual(data, bytes(range(256)) * 4096)
+
+    def test_failed_run_removes_outputs(self):
+        output = self.output()
+        returncode, _ = self.engine.run(python("raise SystemExit(3)"), outputs=[output])
+        self.assertEqual(returncode, 3)
+        self.assertFalse(os.path.exists(output))
+
+    def test_cancel_kills_the_process(self):
+        output = self.output()
+        thread, result, _, ready = self.start("job", TICKER, outputs=[output])
+        self.assertTrue(ready.wait(10))
+        started = time.monotonic()
+        self.engine.cancel("job")
+        thread.join(10)
+        self.assertTrue(result.get("cancelled"))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertFalse(os.path.exists(output))
+
+    def test_cancel_before_start(self):
+        self.engine.cancel("job")
+        with self.assertRaises(JobCancelled):
+            with self.engine.job("job"):
+                pass
+        # Released, the key can run again.
+        self.engine.release("job")
+        with self.engine.job("job"):
+            self.assertEqual(self.engine.run(python("pass"))[0], 0)
+
+    def test_cancel_leaves_other_jobs_alone(self):
+        thread, result, lines, ready = self.start("other", TICKER)
+        self.assertTrue(ready.wait(10))
+        self.engine.cancel("job")
+        thread.join(10)
+        self.assertEqual(result["value"][0], 0)
+        self.assertEqual(len(lines), 101)
+
+    @unittest.skipIf(os.name == "nt", "pausing needs SIGSTOP")
+    def test_pause_stops_and_resume_continues(self):
+        thread, result, lines, ready = self.start("job", TICKER)
+        self.assertTrue(ready.wait(10))
+        self.engine.pause("job")
+        time.sleep(0.2)  # Lines already in the pipe still arrive
+        count = len(lines)
+        time.sleep(0.3)
+        self.assertEqual(len(lines), count)
+        self.engine.resume("job")
+        thread.join(10)
+        self.assertEqual(result["value"][0], 0)
+        self.assertEqual(len(lines), 101)
+
+    def test_paused_job_waits_to_start(self):
+        self.engine.pause("job")
+        thread, result, _, ready = self.start("job", python("print('ran')"))
+        self.assertFalse(ready.wait(0.3))
+        self.engine.resume("job")
+        thread.join(10)
+        self.assertEqual(result["value"][0], 0)
+
+    def test_shutdown_cancels_running_jobs(self):
+        thread, result, _, ready = self.start("job", TICKER)
+        self.assertTrue(ready.wait(10))
+        self.assertTrue(self.engine.shutdown())
+        thread.join(10)
+        self.assertTrue(result.get("cancelled"))
+        with self.assertRaises(JobCancelled):
+            with self.engine.job("next"):
+                pass
+
+if __name__ == "__main__":
+    unittest.main()
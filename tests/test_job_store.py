@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from core.job_store import JobStore
+
+def task(start, end, video="a.mp4", audio=None):
+    task = {"video": video, "start": start, "end": end}
+    if audio:
+        task["audio"] = audio
+    return task
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = JobStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_jobs_keep_queue_order(self):
+        ids = self.store.add_many([task("00:00:01", "00:00:02"), task("00:00:03", "00:00:04")])
+        self.assertEqual([job["id"] for job in self.store.jobs()], ids)
+        self.store.swap(*ids)
+        self.assertEqual([job["id"] for job in self.store.jobs()], ids[::-1])
+
+    def test_unfinished_and_counts(self):
+        a, b, c, d = self.store.add_many([task("0", "1"), task("1", "2"), task("2", "3"), task("3", "4")])
+        self.store.mark(a, "done", output="out.mp4")
+        self.store.mark(b, "failed", error="boom")
+        self.store.mark(c, "cancelled")
+        self.assertEqual([job["id"] for job in self.store.unfinished()], [b, d])
+        self.assertEqual(self.store.counts(), {"done": 1, "failed": 1, "cancelled": 1, "pending": 1})
+        self.assertEqual(self.store.get(a)["output"], "out.mp4")
+        self.assertEqual(self.store.get(b)["error"], "boom")
+
+    def test_mark_rejects_unknown_states(self):
+        job_id = self.store.add(task("0", "1"))
+        with self.assertRaises(ValueError):
+            self.store.mark(job_id, "lost")
+
+    def test_add_missing_skips_stored_tasks(self):
+        self.store.add_many([task("0", "1"), task("1", "2", audio="a.m4a")])
+        added = self.store.add_missing([task("0", "1"), task("1", "2"), task("1", "2", audio="a.m4a")])
+        self.assertEqual(len(added), 1)
+        self.assertIsNone(self.store.get(added[0])["audio"])
+        self.assertEqual(len(self.store.jobs()), 3)
+
+    def test_retarget(self):
+        job_id = self.store.add(task("00:10:00", "00:10:05", video="https://example.com/v"))
+        self.store.retarget(job_id, "piece.mp4", "00:00:05", "00:00:10", "piece.m4a")
+        job = self.store.get(job_id)
+        self.assertEqual((job["video"], job["start"], job["end"], job["audio"]),
+                         ("piece.mp4", "00:00:05", "00:00:10", "piece.m4a"))
+
+    def test_clear_and_remove(self):
+        a, b = self.store.add_many([task("0", "1"), task("1", "2")])
+        self.store.mark(a, "done")
+        self.store.clear()
+        self.assertEqual([job["id"] for job in self.store.jobs()], [b])
+        self.store.remove(b)
+        self.assertEqual(self.store.jobs(), [])
+
+    def test_state_survives_reopening(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "queue.sqlite3")
+            store = JobStore(path)
+            done, pending = store.add_many([task("0", "1"), task("1", "2")])
+            store.mark(done, "done")
+            store.close()
+            store = JobStore(path)
+            self.assertEqual([job["id"] for job in store.unfinished()], [pending])
+            store.close()
+
+if __name__ == "__main__":
+    unittest.main()
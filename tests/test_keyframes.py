@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from array import array
+from core.keyframes import KeyframeIndex
+
+class KeyframeIndexTest(unittest.TestCase):
+    def setUp(self):
+        # Keyframes every 2 s whose decode times run 0.08 s ahead (B-frames).
+        self.index = KeyframeIndex(
+            array("d", [0.0, 2.0, 4.0, 6.0]),
+            array("d", [-0.08, 1.92, 3.92, 5.92]),
+            duration=7.5
+        )
+
+    def test_before(self):
+        self.assertEqual(self.index.before(3.9), 2.0)
+        self.assertEqual(self.index.before(4.0), 4.0)
+        self.assertEqual(self.index.before(100), 6.0)
+        # Before the first keyframe, the first one is the best there is.
+        self.assertEqual(KeyframeIndex(array("d", [0.5])).before(0.1), 0.5)
+
+    def test_after(self):
+        self.assertEqual(self.index.after(2.1), 4.0)
+        self.assertEqual(self.index.after(2.0), 2.0)
+        self.assertIsNone(self.index.after(6.1))
+
+    def test_nearest(self):
+        self.assertEqual(self.index.nearest(2.9), 2.0)
+        self.assertEqual(self.index.nearest(3.1), 4.0)
+
+    def test_decode_time(self):
+        self.assertEqual(self.index.decode_time(4.0), 3.92)
+        self.assertEqual(KeyframeIndex(array("d", [0.0, 2.0])).decode_time(2.0), 2.0)
+
+    def test_empty_index(self):
+        index = KeyframeIndex(array("d"))
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.before(1.0))
+        self.assertIsNone(index.after(1.0))
+        self.assertIsNone(index.nearest(1.0))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "video.kfi")
+            self.index.save(path)
+            loaded = KeyframeIndex.load(path)
+        self.assertEqual(list(loaded.times), list(self.index.times))
+        self.assertEqual(list(loaded.dts), list(self.index.dts))
+        self.assertEqual(loaded.duration, 7.5)
+
+    def test_load_rejects_other_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "video.kfi")
+            with open(path, "wb") as f:
+                f.write(b"\0" * 64)
+            with self.assertRaises(ValueError):
+                KeyframeIndex.load(path)
+
+if __name__ == "__main__":
+    unittest.main()
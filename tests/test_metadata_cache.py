@@ -0,0 +1,136 @@
+import sys
+import types
+import unittest
+from unittest import mock
+from core.downloader import extract_info
+from core.metadata_cache import MetadataCache, video_key
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class VideoKeyTest(unittest.TestCase):
+    def test_extractor_is_case_insensitive(self):
+        self.assertEqual(video_key("Youtube", "abc"), video_key("youtube", "abc"))
+
+    def test_video_id_is_case_sensitive(self):
+        self.assertEqual(video_key("Youtube", "abcDEF"), "youtube:abcDEF")
+        self.assertNotEqual(video_key("youtube", "abcDEF"), video_key("youtube", "abcdef"))
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = MetadataCache(":memory:", ttl=60, clock=self.clock)
+        self.info = {"id": "abcDEF", "extractor_key": "Youtube", "title": "A video"}
+
+    def test_get_by_url_and_id(self):
+        self.cache.put("https://example.com/watch?v=abcDEF", self.info)
+        self.assertEqual(self.cache.get("https://example.com/watch?v=abcDEF"), self.info)
+        self.assertEqual(self.cache.get_by_id("youtube", "abcDEF"), self.info)
+        self.assertIsNone(self.cache.get_by_id("youtube", "abcdef"))
+        self.assertIsNone(self.cache.get("https://example.com/other"))
+
+    def test_ids_differing_in_case_are_separate_entries(self):
+        other = dict(self.info, id="abcdef", title="Another video")
+        self.cache.put("https://example.com/1", self.info)
+        self.cache.put("https://example.com/2", other)
+        self.assertEqual(self.cache.get_by_id("Youtube", "abcDEF")["title"], "A video")
+        self.assertEqual(self.cache.get_by_id("Youtube", "abcdef")["title"], "Another video")
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.put("https://example.com/1", self.info)
+        self.clock.now += 60
+        self.assertEqual(self.cache.get("https://example.com/1"), self.info)
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get("https://example.com/1"))
+        self.assertIsNone(self.cache.get_by_id("youtube", "abcDEF"))
+
+    def test_put_refreshes_an_entry(self):
+        self.cache.put("https://example.com/1", self.info)
+        self.clock.now += 50
+        self.cache.put("https://example.com/1", dict(self.info, title="Renamed"))
+        self.clock.now += 50
+        self.assertEqual(self.cache.get("https://example.com/1")["title"], "Renamed")
+
+    def test_purge_expired(self):
+        self.cache.put("https://example.com/old", self.info)
+        self.clock.now += 30
+        self.cache.put("https://example.com/new", dict(self.info, id="new"))
+        self.clock.now += 40
+        self.cache.purge_expired()
+        # Only the fresh entry is left, even with a longer TTL.
+        self.cache.ttl = 3600
+        self.assertIsNone(self.cache.get("https://example.com/old"))
+        self.assertEqual(self.cache.get("https://example.com/new")["id"], "new")
+
+    def test_invalidate(self):
+        self.cache.put("https://example.com/1", self.info)
+        self.cache.invalidate("https://example.com/1")
+        self.assertIsNone(self.cache.get("https://example.com/1"))
+
+    def test_info_without_id_is_keyed_by_url(self):
+        self.cache.put("https://example.com/file.mp4", {"title": "Direct link"})
+        self.assertEqual(self.cache.get_by_id("generic", "https://example.com/file.mp4")["title"], "Direct link")
+
+class FakeYoutubeDL:
+    """Local stand-in for yt_dlp.YoutubeDL that counts extractions."""
+    extractions = []
+    result = None
+
+    def __init__(self, params=None):
+        self.params = params
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True, process=True):
+        FakeYoutubeDL.extractions.append((url, download, process))
+        return dict(FakeYoutubeDL.result)
+
+    @staticmethod
+    def sanitize_info(info, remove_private_keys=False):
+        return info
+
+class ExtractInfoTest(unittest.TestCase):
+    def setUp(self):
+        FakeYoutubeDL.extractions = []
+        FakeYoutubeDL.result = {"id": "abcDEF", "extractor_key": "Youtube", "title": "A video"}
+        patcher = mock.patch.dict(sys.modules, {"yt_dlp": types.SimpleNamespace(YoutubeDL=FakeYoutubeDL)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+        self.cache = MetadataCache(":memory:", ttl=60, clock=self.clock)
+        self.url = "https://example.com/watch?v=abcDEF"
+
+    def test_cache_hit_skips_extraction(self):
+        first = extract_info(self.url, cache=self.cache)
+        second = extract_info(self.url, cache=self.cache)
+        self.assertEqual(first, second)
+        self.assertEqual(FakeYoutubeDL.extractions, [(self.url, False, False)])
+
+    def test_expired_entry_is_extracted_again(self):
+        extract_info(self.url, cache=self.cache)
+        self.clock.now += 61
+        extract_info(self.url, cache=self.cache)
+        self.assertEqual(len(FakeYoutubeDL.extractions), 2)
+
+    def test_refresh_bypasses_the_cache(self):
+        extract_info(self.url, cache=self.cache)
+        extract_info(self.url, cache=self.cache, refresh=True)
+        self.assertEqual(len(FakeYoutubeDL.extractions), 2)
+
+    def test_playlists_are_not_cached(self):
+        FakeYoutubeDL.result = {"_type": "playlist", "id": "PL1", "entries": []}
+        extract_info(self.url, cache=self.cache)
+        extract_info(self.url, cache=self.cache)
+        self.assertEqual(len(FakeYoutubeDL.extractions), 2)
+        self.assertIsNone(self.cache.get(self.url))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import functools
+import http.server
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import media
+from core.downloader import fetch_range, merge_ranges
+
+class MergeRangesTest(unittest.TestCase):
+    def test_ranges_are_widened_by_the_margin(self):
+        self.assertEqual(merge_ranges([(10.0, 20.0)], margin=5.0), [(5.0, 25.0, [0])])
+
+    def test_margin_stops_at_zero(self):
+        self.assertEqual(merge_ranges([(2.0, 4.0)], margin=5.0), [(0.0, 9.0, [0])])
+
+    def test_overlapping_ranges_share_a_piece(self):
+        pieces = merge_ranges([(100.0, 110.0), (10.0, 20.0), (28.0, 40.0)], margin=5.0)
+        self.assertEqual(pieces, [(5.0, 45.0, [1, 2]), (95.0, 115.0, [0])])
+
+    def test_contained_range(self):
+        self.assertEqual(merge_ranges([(10.0, 60.0), (20.0, 30.0)], margin=0.0), [(10.0, 60.0, [0, 1])])
+
+    def test_no_ranges(self):
+        self.assertEqual(merge_ranges([]), [])
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files with single-range Range support, counting the body bytes it sends."""
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if match is None or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2) or size - 1), size - 1)
+        if start >= size:
+            self.send_error(416)
+            return None
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self.remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "remaining", None)
+        while remaining is None or remaining > 0:
+            data = source.read(64 * 1024 if remaining is None else min(64 * 1024, remaining))
+            if not data:
+                break
+            try:
+                outputfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                break  # ffmpeg hung up to seek elsewhere
+            if remaining is not None:
+                remaining -= len(data)
+            with self.server.lock:
+                self.server.bytes_sent += len(data)
+
+@unittest.skipUnless(media.FFMPEG, "needs ffmpeg")
+class FetchRangeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        # Two minutes of noisy video with the index up front, as streaming sites serve it.
+        cls.source = os.path.join(cls.tmp, "source.mp4")
+        media.make_video(cls.source, 120, noise=True, faststart=True)
+        handler = functools.partial(RangeRequestHandler, directory=cls.tmp)
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.server.lock = threading.Lock()
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/source.mp4"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_fetches_only_the_range(self):
+        self.server.bytes_sent = 0
+        output = os.path.join(self.tmp, "piece.mp4")
+        fetch_range([{"url": self.url, "vcodec": "avc1", "acodec": "mp4a"}], 60.0, 70.0, output)
+        self.assertAlmostEqual(media.duration(output), 10.0, delta=0.5)
+        # The index plus about 10 of the 120 seconds; nowhere near the whole file.
+        self.assertLess(self.server.bytes_sent, os.path.getsize(self.source) / 4)
+
+    def test_separate_streams(self):
+        output = os.path.join(self.tmp, "streams.mp4")
+        fetch_range([
+            {"url": self.url, "vcodec": "avc1", "acodec": "none"},
+            {"url": self.url, "vcodec": "none", "acodec": "mp4a"},
+        ], 30.0, 35.0, output)
+        self.assertAlmostEqual(media.duration(output), 5.0, delta=0.5)
+        self.assertEqual(media.stream_count(output), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+from pathlib import Path
+from unittest import mock
+import media
+import core.trimmer as trimmer
+from core.job_store import JobStore
+from core.keyframes import KeyframeIndex
+
+SECONDS = 20
+
+def task(video, start, end):
+    return {"video": video, "start": start, "end": end}
+
+@unittest.skipUnless(media.FFMPEG, "needs ffmpeg")
+class TrimTestCase(unittest.TestCase):
+    """Cuts from a 20 s H.264 clip with a keyframe every 2 s, whose keyframe index is known up front."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.source = os.path.join(cls.tmp, "source.mp4")
+        media.make_video(cls.source, SECONDS)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp(dir=self.tmp))
+        self.commands = []
+        run = trimmer._run
+
+        def _record(cmd, *args, **kwargs):
+            self.commands.append(cmd)
+            return run(cmd, *args, **kwargs)
+
+        self.index = KeyframeIndex(array("d", media.keyframe_times(SECONDS)), duration=float(SECONDS))
+        patches = (
+            ("_run", _record),
+            ("get_keyframe_index", lambda *args, **kwargs: self.index),
+            ("_probe_video_stream", lambda video_file: ("h264", "yuv420p")),
+        )
+        for target, value in patches:
+            patcher = mock.patch.object(trimmer, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def trim(self, tasks, mode="copy"):
+        """Runs tasks as one trim group; returns {job_id: row} of the store afterwards."""
+        store = JobStore(":memory:")
+        store.add_many(tasks)
+        trimmer.run_trim_group(store, store.jobs(), mode, cache=None, output_dir=self.output_dir)
+        return {job["id"]: job for job in store.jobs()}
+
+class GroupedCopyTest(TrimTestCase):
+    TASKS = [("00:00:03", "00:00:05"), ("00:00:03.500", "00:00:06"), ("00:00:09", "00:00:12")]
+
+    def test_one_pass_with_per_output_seeks(self):
+        jobs = self.trim([task(self.source, start, end) for start, end in self.TASKS])
+        self.assertEqual([job["state"] for job in jobs.values()], ["done"] * 3)
+        self.assertEqual(len(self.commands), 1)
+        cmd = self.commands[0]
+        # One input seek to the earliest start, then the arguments of each output.
+        self.assertEqual(float(cmd[cmd.index("-i") - 1]), 3.0)
+        outputs = [i for i, arg in enumerate(cmd) if arg.endswith(".part.mp4")]
+        self.assertEqual(len(outputs), 3)
+        starts = [cmd.index("-i") + 2] + [i + 1 for i in outputs[:-1]]
+        seeks = [cmd[start:end] for start, end in zip(starts, outputs)]
+        # The first two ranges share the GOP the input seek lands in; the third seeks to
+        # the decode time of its own keyframe (8 s), just under 5 s past the input seek.
+        self.assertNotIn("-ss", seeks[0])
+        self.assertNotIn("-ss", seeks[1])
+        self.assertAlmostEqual(float(seeks[2][seeks[2].index("-ss") + 1]), 8.0 - 0.001 - 3.0, places=6)
+
+    def test_grouped_outputs_match_single_cuts(self):
+        tasks = [task(self.source, start, end) for start, end in self.TASKS]
+        grouped = self.trim(tasks)
+        self.index = None  # No index: each task is cut on its own
+        single = self.trim(tasks)
+        self.assertEqual(len(self.commands), 1 + len(tasks))
+        for job_id in grouped:
+            self.assertAlmostEqual(media.duration(grouped[job_id]["output"]), media.duration(single[job_id]["output"]),
+                                   delta=0.05)
+
+class SmartCutTest(TrimTestCase):
+    def test_head_is_reencoded_and_tail_copied(self):
+        job = self.trim([task(self.source, "00:00:03", "00:00:09")], "smart")[1]
+        self.assertEqual(job["state"], "done")
+        head, tail, joined = self.commands
+        # Re-encoded from the start up to the first keyframe inside the clip (4 s)...
+        self.assertEqual(head[head.index("-ss") + 1], "3.000000")
+        self.assertEqual(head[head.index("-t") + 1], "1.000000")
+        self.assertIn("libx264", head)
+        # ...stream copied from that keyframe to the end, and the two parts joined.
+        self.assertEqual(tail[tail.index("-ss") + 1], "4.000000")
+        self.assertEqual(tail[tail.index("-c") + 1], "copy")
+        self.assertIn("concat", joined)
+        # Frame accurate, unlike a stream copy, which would start at the keyframe at 2 s.
+        self.assertAlmostEqual(media.duration(job["output"]), 6.0, delta=0.05)
+
+    def test_start_on_a_keyframe_is_copied(self):
+        job = self.trim([task(self.source, "00:00:04", "00:00:09")], "smart")[1]
+        self.assertEqual(job["state"], "done")
+        self.assertEqual(len(self.commands), 1)
+        self.assertEqual(self.commands[0][self.commands[0].index("-c") + 1], "copy")
+        self.assertAlmostEqual(media.duration(job["output"]), 5.0, delta=0.05)
+
+    def test_range_within_one_gop_is_reencoded(self):
+        job = self.trim([task(self.source, "00:00:04.500", "00:00:05.500")], "smart")[1]
+        self.assertEqual(job["state"], "done")
+        self.assertEqual(len(self.commands), 1)
+        self.assertIn("libx264", self.commands[0])
+        self.assertAlmostEqual(media.duration(job["output"]), 1.0, delta=0.05)
+
+if __name__ == "__main__":
+    unittest.main()